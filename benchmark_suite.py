@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite with regression tracking for PackageDependencyAnalyzer
+
+Runs a fixed set of phases (parse, unfiltered and arch/profile-filtered index
+build, warm snapshot load, direct reverse lookups, binary-mode and source-mode queries, multi-chain queries,
+export, dependency field parsing, whole-archive build order and impact ranking)
+against the bundled trimmed trixie fixture and synthetic Sources files produced
+by generate_sources.py, and records the best wall time and the peak traced
+memory of every phase. Optional phases measure parallel batch analysis with
+several worker counts, the Provides index of a Packages file, and the legacy
+implementation (full-field parse and a rescan of the Sources file per query).
+
+Results can be stored as JSON and compared with a stored baseline; phases that
+got slower or use more memory than the threshold are flagged and the script
+exits with status 1, so it can gate CI:
+
+    python3 benchmark_suite.py --output baseline.json            # on the base revision
+    python3 benchmark_suite.py --baseline baseline.json          # on the change
+    python3 benchmark_suite.py --no-fixture --packages "" --sources result/Sources \
+        --targets debhelper,cmake,libssl-dev --workers 1,2,4 --legacy    # real mirror data
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import package_dependency_analyzer
+from generate_sources import SourcesShape, generate
+from package_dependency_analyzer import PackageDependencyAnalyzer
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "Sources.trixie-sample")
+RESULTS_VERSION = 1
+
+
+def legacy_parse_sources_file(sources_file: str) -> Dict[str, Dict[str, str]]:
+    """旧实现：解析Sources文件，为每个包保留所有字段"""
+    packages = {}
+    current_package = {}
+    current_package_name = None
+
+    with open(sources_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+
+            if not line:
+                if current_package_name and current_package:
+                    packages[current_package_name] = current_package.copy()
+                current_package = {}
+                current_package_name = None
+                continue
+
+            if ':' in line:
+                field, value = line.split(':', 1)
+                field = field.strip()
+                current_package[field] = value.strip()
+                if field == 'Package':
+                    current_package_name = value.strip()
+
+    if current_package_name and current_package:
+        packages[current_package_name] = current_package.copy()
+
+    return packages
+
+
+def legacy_parse_dependencies(dep_string: str) -> List[str]:
+    """旧实现：用正则去掉版本和架构限制，只取每组可选依赖中的第一个"""
+    if not dep_string:
+        return []
+
+    dep_string = re.sub(r'\([^)]*\)', '', dep_string)
+    dep_string = re.sub(r'\[[^\]]*\]', '', dep_string)
+
+    deps = []
+    for dep in dep_string.split(','):
+        dep = dep.split('|')[0].strip()
+        if dep and not dep.startswith('$'):
+            deps.append(dep)
+
+    return deps
+
+
+def legacy_analysis(sources_file: str, target: str, no_all: str = "yes") -> Dict[str, List[str]]:
+    """旧实现：每次查询都重新解析Sources文件并扫描所有源码包"""
+    packages = legacy_parse_sources_file(sources_file)
+    result_dict = {}
+
+    for pkg_name, pkg_info in packages.items():
+        all_deps = legacy_parse_dependencies(pkg_info.get('Build-Depends', '')) + \
+            legacy_parse_dependencies(pkg_info.get('Build-Depends-Indep', ''))
+
+        if target in all_deps:
+            architecture = pkg_info.get('Architecture', '')
+            if no_all.lower() == "yes" and architecture == 'all':
+                continue
+            result_dict[pkg_name] = [pkg_name, pkg_info.get('Section', 'unknown'), architecture, pkg_info.get('Homepage', '')]
+
+    return result_dict
+
+
+def _measure(phase: Callable[[], None], setup: Callable[[], None], repeat: int) -> Tuple[float, int]:
+    """返回 (repeat次中最短的耗时, 峰值内存)；tracemalloc会拖慢执行，因此内存单独测量一次"""
+    best = None
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        start = time.perf_counter()
+        phase()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    phase()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def _query_targets(analyzer: PackageDependencyAnalyzer, count: int,
+                   targets: List[str] = ()) -> Tuple[List[str], List[str]]:
+    """查询用的二进制包（指定的targets中数据集里有的，否则取直接依赖者最多的count个），以及产生它们的源码包；
+    结果只取决于数据集"""
+    binaries = [name for name in targets if name in analyzer._binary_to_source]
+    if not binaries:
+        reverse_index = analyzer._get_reverse_index()
+        binaries = [name for name in analyzer._binary_to_source]
+        binaries.sort(key=lambda name: (-len(reverse_index.get(name, ())), name))
+        binaries = binaries[:count]
+    sources = list(dict.fromkeys(analyzer._binary_to_source[name] for name in binaries))
+    return binaries, sources
+
+
+def run_dataset(sources_file: str, work_dir: str, queries: int, repeat: int, targets: List[str] = (),
+                chains: int = 4, workers: List[int] = (), packages_file: Optional[str] = None,
+                legacy: bool = False) -> Dict[str, any]:
+    """对一个Sources文件执行所有阶段，返回数据集信息和各阶段的结果
+    
+    Args:
+        targets: 查询的二进制包，为空时按数据集自动选取queries个
+        chains: chains-query阶段每个目标记录的最短依赖链条数
+        workers: 为每个进程数测量一次并行批量分析（parallel-N阶段）
+        packages_file: 测量该Packages文件的Provides索引冷/热加载（provides、provides-load阶段）
+        legacy: 测量旧实现的完整字段解析和逐次扫描查询（legacy-parse、legacy-query阶段），并检查结果
+    """
+    analyzer = PackageDependencyAnalyzer()
+    analyzer.sources_file = sources_file
+    analyzer.result_dir = os.path.join(work_dir, "export")
+    phases = {}
+
+    def record(name: str, phase: Callable[[], None], setup: Callable[[], None] = lambda: None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, peak = _measure(phase, setup, repeat)
+        phases[name] = {'seconds': round(seconds, 6), 'peak_mb': round(peak / 1024 / 1024, 3)}
+
+    # 解析：Sources -> 精简包表
+    def parse():
+        analyzer._packages, analyzer._binary_to_source, analyzer._binary_owners = analyzer._parse_sources_file()
+    record("parse", parse)
+
+    # 索引：反向构建依赖索引和源码包依赖图（清空依赖字段解析缓存，测量冷构建）
+    def reset_index():
+        analyzer._reverse_index = None
+        analyzer._source_graph = None
+        package_dependency_analyzer.clear_relation_caches()
+
+    def build_index():
+        analyzer._build_reverse_index()
+        analyzer._get_source_graph()
+    record("index", build_index, reset_index)
+
+    # 按架构和构建配置过滤的索引（--arch amd64 --profiles ""），之后恢复不过滤的索引
+    analyzer.set_dependency_filter("amd64", [])
+    record("index-filtered", build_index, reset_index)
+    analyzer.set_dependency_filter(None, None)
+    build_index()
+
+    # 热启动：写入快照后由新的分析器加载
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer._write_snapshot()
+
+    def load_snapshot():
+        warm = PackageDependencyAnalyzer()
+        warm.sources_file = sources_file
+        if not warm._load_snapshot():
+            raise RuntimeError(f"无法加载快照: {analyzer._snapshot_path()}")
+    record("snapshot-load", load_snapshot)
+
+    binaries, source_targets = _query_targets(analyzer, queries, targets)
+    results = {}
+
+    # 直接依赖查找（反向索引）
+    record("analysis", lambda: [analyzer.analysis(target) for target in binaries])
+
+    # 二进制包模式和源码包模式的批量查询（含依赖链条）
+    def binary_query():
+        results['binary'] = analyzer.analyze_many(binaries, "binary")
+    record("binary-query", binary_query)
+    record("source-query", lambda: analyzer.analyze_many(source_targets, "source"))
+
+    # 导出：把二进制包模式的结果写成csv和jsonl
+    def export():
+        for output_format in ("csv", "jsonl"):
+            writer = analyzer._open_writer(output_format, binaries)
+            for source_pkg, data in results['binary'].items():
+                writer.write(source_pkg, data)
+            writer.close()
+    record("export", export)
+
+    # 多条依赖链条：每个(源码包, 目标)记录chains条最短链条
+    def chains_query():
+        analyzer.max_chains = chains
+        try:
+            analyzer.analyze_many(binaries, "binary")
+        finally:
+            analyzer.max_chains = 1
+    record("chains-query", chains_query)
+
+    # 依赖字段解析（冷）：旧正则、只取包名（不过滤时建立索引所用）、按架构和构建配置过滤后的包名
+    # （过滤时建立索引所用），以及结构化的Relation（完整解析版本、架构和构建配置限制，建立索引不使用）
+    dep_strings = [value for pkg in analyzer._packages.values()
+                   for value in (pkg.build_depends, pkg.build_depends_indep) if value]
+    record("deps-legacy", lambda: [legacy_parse_dependencies(value) for value in dep_strings])
+    record("deps-names", lambda: [package_dependency_analyzer.relation_names(value) for value in dep_strings],
+           package_dependency_analyzer.clear_relation_caches)
+    record("deps-filtered", lambda: [package_dependency_analyzer.filtered_relation_names(value, "amd64", frozenset())
+                                     for value in dep_strings], package_dependency_analyzer.clear_relation_caches)
+    record("deps-structured", lambda: [package_dependency_analyzer.parse_relations(value) for value in dep_strings],
+           package_dependency_analyzer.clear_relation_caches)
+
+    # 整个归档：分轮构建顺序，以及影响排名的计算和读取缓存
+    record("build-order", lambda: analyzer.build_order(None, "no"))
+    ranking_path = analyzer._ranking_path()
+
+    def reset_ranking():
+        analyzer._rankings = {}
+        if os.path.exists(ranking_path):
+            os.remove(ranking_path)
+    record("ranking", lambda: analyzer.impact_ranking("no"), reset_ranking)
+    record("ranking-load", lambda: analyzer.impact_ranking("no"), lambda: analyzer._rankings.clear())
+
+    # 并行批量分析：包表和依赖图已加载，由工作进程通过fork继承
+    for count in workers:
+        def parallel(count=count):
+            analyzer.workers = count
+            try:
+                analyzer.analyze_many(binaries, "binary")
+            finally:
+                analyzer.workers = 1
+        record(f"parallel-{count}", parallel)
+
+    # Provides索引：冷（解析Packages并写快照）和热（加载快照）
+    if packages_file:
+        analyzer.packages_archs = ["bench"]
+        shutil.copy(packages_file, analyzer._packages_file("bench"))
+        provides_cache = analyzer._packages_file("bench") + ".cache"
+
+        def reset_provides():
+            analyzer._provided_names = None
+            if os.path.exists(provides_cache):
+                os.remove(provides_cache)
+        record("provides", analyzer._get_provided_names, reset_provides)
+        record("provides-load", analyzer._get_provided_names, lambda: setattr(analyzer, '_provided_names', None))
+        analyzer.packages_archs = []
+        analyzer._invalidate_provides()
+
+    # 旧实现：完整字段解析，每次查询都重新解析并扫描整个Sources文件
+    if legacy:
+        record("legacy-parse", lambda: legacy_parse_sources_file(sources_file))
+        legacy_results = {}
+
+        def legacy_query():
+            for target in binaries:
+                legacy_results[target] = legacy_analysis(sources_file, target)
+        record("legacy-query", legacy_query)
+        # 新解析器包含所有可选依赖并识别构建配置限制，结果应为旧实现的超集
+        for target in binaries:
+            if not set(legacy_results[target]) <= set(analyzer.analysis(target)):
+                raise RuntimeError(f"'{target}' 的索引结果缺少旧实现找到的源码包")
+
+    return {
+        'sources': len(analyzer._packages),
+        'binaries': len(analyzer._binary_to_source),
+        'size_mb': round(os.path.getsize(sources_file) / 1024 / 1024, 3),
+        'queries': {'binary': binaries, 'source': source_targets},
+        'affected': len(results['binary']),
+        'phases': phases,
+    }
+
+
+def compare(baseline: Dict[str, any], current: Dict[str, any], threshold: float,
+            min_seconds: float, min_mb: float) -> List[str]:
+    """与基线比较，打印每个阶段的变化，返回退化项的描述"""
+    regressions = []
+    print(f"\n与基线比较（{baseline.get('created', '?')}, Python {baseline.get('python', '?')}）:")
+    for dataset, result in current['datasets'].items():
+        base = baseline.get('datasets', {}).get(dataset)
+        if base is None:
+            print(f"  {dataset}: 基线中没有该数据集，跳过")
+            continue
+        if base.get('sources') != result['sources']:
+            print(f"  {dataset}: 数据集规模不同（{base.get('sources')} -> {result['sources']} 个源码包），跳过")
+            continue
+        for phase, values in result['phases'].items():
+            base_values = base['phases'].get(phase)
+            if base_values is None:
+                continue
+            for metric, unit, minimum in (('seconds', 's', min_seconds), ('peak_mb', 'MB', min_mb)):
+                old, new = base_values[metric], values[metric]
+                change = (new - old) / old if old else 0.0
+                flag = ""
+                if new - old > minimum and change > threshold:
+                    flag = "  <-- 退化"
+                    regressions.append(f"{dataset}/{phase} {metric}: {old:g}{unit} -> {new:g}{unit} ({change:+.0%})")
+                elif old - new > minimum and -change > threshold:
+                    flag = "  (改进)"
+                print(f"  {dataset:<20} {phase:<16} {metric:<8} {old:>10.4f} -> {new:>10.4f} {unit:<2} {change:+7.1%}{flag}")
+    return regressions
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    defaults = SourcesShape()
+    parser = argparse.ArgumentParser(description="Benchmark suite with regression tracking")
+    parser.add_argument("--packages", default="2000,40000",
+                        help="逗号分隔的合成数据集源码包数（默认 2000,40000），为空时不生成合成数据集")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="合成数据集的依赖层数")
+    parser.add_argument("--fan-out", type=int, default=defaults.fan_out, help="合成数据集的平均构建依赖数")
+    parser.add_argument("--cycles", type=int, default=defaults.cycles, help="合成数据集的构建依赖环数")
+    parser.add_argument("--sources", action="append", default=[],
+                        help="额外测量的Sources文件（如 result/Sources），可重复指定")
+    parser.add_argument("--no-fixture", action="store_true", help="不测量内置的trixie样例")
+    parser.add_argument("--queries", type=int, default=5, help="每种查询的目标数（默认5）")
+    parser.add_argument("--targets", default="",
+                        help="逗号分隔的查询二进制包（如 debhelper,cmake,libssl-dev），数据集中没有时自动选取")
+    parser.add_argument("--chains", type=int, default=4, help="chains-query阶段每个目标记录的最短依赖链条数（默认4）")
+    parser.add_argument("--workers", default="",
+                        help="逗号分隔的工作进程数（如 1,2,4,8），额外测量并行批量分析的扩展性")
+    parser.add_argument("--packages-file",
+                        help="额外测量该Packages文件（如 result/Packages_amd64）的Provides索引冷/热加载")
+    parser.add_argument("--legacy", action="store_true",
+                        help="额外测量旧实现（完整字段解析、每次查询重新扫描Sources），大文件上较慢")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段的重复次数，取最短耗时（默认3）")
+    parser.add_argument("--output", help="把结果保存为JSON文件（可作为之后比较的基线）")
+    parser.add_argument("--baseline", help="与之比较的基线JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的相对变化（默认0.2，即20%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="小于该绝对耗时变化（毫秒）时不判定退化")
+    parser.add_argument("--min-delta-mb", type=float, default=0.5, help="小于该绝对内存变化（MB）时不判定退化")
+    parser.add_argument("--work-dir", help="生成数据和导出结果的目录（默认使用临时目录并在结束后删除）")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pda-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        # 数据集都复制或生成到工作目录，快照等旁路文件不会写到仓库或镜像目录中
+        datasets = {}
+        if not args.no_fixture:
+            datasets["fixture"] = shutil.copy(FIXTURE, os.path.join(work_dir, "Sources.fixture"))
+        for count in [int(value) for value in args.packages.split(",") if value.strip()]:
+            path = os.path.join(work_dir, f"Sources.synthetic-{count}")
+            shape = SourcesShape(packages=count, depth=args.depth, fan_out=args.fan_out, cycles=args.cycles)
+            stats = generate(path, shape)
+            print(f"已生成合成数据集 synthetic-{count}: {stats['sources']} 个源码包, {stats['relations']} 个构建依赖关系")
+            datasets[f"synthetic-{count}"] = path
+        for path in args.sources:
+            name = os.path.basename(path)
+            datasets[name] = shutil.copy(path, os.path.join(work_dir, f"Sources.{name}"))
+
+        current = {
+            'version': RESULTS_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'datasets': {},
+        }
+        for name, path in datasets.items():
+            print(f"\n数据集 {name}:")
+            result = run_dataset(path, work_dir, args.queries, args.repeat, _split(args.targets), args.chains,
+                                 [int(value) for value in _split(args.workers)], args.packages_file, args.legacy)
+            current['datasets'][name] = result
+            print(f"  {result['sources']} 个源码包, {result['binaries']} 个二进制包, {result['size_mb']:.1f} MB, "
+                  f"二进制包查询影响 {result['affected']} 个源码包")
+            for phase, values in result['phases'].items():
+                print(f"  {phase:<16} {values['seconds'] * 1000:>10.2f} ms   峰值内存 {values['peak_mb']:>8.2f} MB")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != RESULTS_VERSION:
+            print(f"ERROR: 基线格式版本 {baseline.get('version')} 与当前版本 {RESULTS_VERSION} 不一致")
+            return 2
+        regressions = compare(baseline, current, args.threshold, args.min_delta_ms / 1000, args.min_delta_mb)
+        if regressions:
+            print(f"\n检测到 {len(regressions)} 项性能退化:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\n没有检测到性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Check of the incremental Sources.xz download against a local HTTP mirror
+
+Generates Sources files for a main and a contrib component with
+generate_sources.py, serves them as dists/<suite>/<component>/source/Sources.xz
+from a local http.server that answers conditional requests (If-None-Match /
+If-Modified-Since) with 304, and runs PackageDependencyAnalyzer.init()
+against it to check that
+
+  * the first download gets 200, writes Sources, its snapshot and Sources.meta
+    with the ETag/Last-Modified of the response,
+  * a second run sends a conditional request, gets 304 and leaves Sources,
+    Sources.meta and the snapshot untouched,
+  * force=True (--force-download) downloads again without conditions,
+  * a changed Sources.xz on the mirror is downloaded again,
+  * switching the component list (main -> main,contrib -> main ->
+    main,contrib) rebuilds Sources from exactly the listed components, even
+    when every component itself gets 304, while an unchanged component list
+    gets 304 for every component and no rebuild,
+
+once with a server that sends ETags and once with Last-Modified only. Exits
+with status 1 on any failure:
+
+    python3 check_downloads.py
+"""
+
+import argparse
+import email.utils
+import json
+import logging
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from generate_sources import SourcesShape, generate
+from package_dependency_analyzer import PackageDependencyAnalyzer
+
+SUITE = "trixie"
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    """只读的镜像目录：按文件的大小和mtime生成ETag，条件请求匹配时返回304，并记录每个请求"""
+
+    def do_GET(self):
+        server = self.server
+        path = os.path.join(server.root, self.path.lstrip('/'))
+        conditional = bool(self.headers.get('If-None-Match') or self.headers.get('If-Modified-Since'))
+        if not os.path.isfile(path):
+            server.requests.append((self.path, 404, conditional))
+            self.send_error(404)
+            return
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"' if server.etag else None
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        if self.headers.get('If-None-Match'):
+            not_modified = self.headers['If-None-Match'] == etag
+        elif self.headers.get('If-Modified-Since'):
+            since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since']).timestamp()
+            not_modified = int(stat.st_mtime) <= since
+        else:
+            not_modified = False
+
+        status = 304 if not_modified else 200
+        server.requests.append((self.path, status, conditional))
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-Length', str(stat.st_size))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _write_xz(mirror: str, component: str, text: bytes, mtime: float = None):
+    """把Sources内容压缩后放到镜像的 dists/SUITE/component/source/Sources.xz"""
+    path = os.path.join(mirror, "dists", SUITE, component, "source", "Sources.xz")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with lzma.open(path, 'wb') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def _main_sources(work_dir: str, packages: int, seed: int) -> bytes:
+    path = os.path.join(work_dir, f"Sources.main-{seed}")
+    generate(path, SourcesShape(packages=packages, seed=seed))
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _contrib_sources(count: int) -> bytes:
+    """contrib组件：几个包名与main不冲突、构建依赖main中的包的源码包"""
+    return "".join(f"Package: contrib-tool{i}\nBinary: contrib-tool{i}\nArchitecture: any\n"
+                   f"Build-Depends: debhelper-compat (= 13), lib{i}-0\nSection: contrib/utils\n\n"
+                   for i in range(count)).encode('utf-8')
+
+
+def _file_states(sources_file: str) -> Dict[str, tuple]:
+    """Sources及其元数据和快照的 (大小, mtime)，不存在的文件为None"""
+    states = {}
+    for suffix in ('', '.meta', '.cache'):
+        path = sources_file + suffix
+        states[suffix or 'Sources'] = (os.stat(path).st_size, os.stat(path).st_mtime_ns) if os.path.exists(path) else None
+    return states
+
+
+def _check(errors: List[str], label: str, ok: bool, detail: str = ""):
+    """记录并打印一项检查的结果"""
+    if ok:
+        print(f"  {label}: 通过")
+    else:
+        errors.append(f"{label}: {detail}")
+        print(f"  {label}: 失败 {detail}")
+
+
+def run_scenario(work_dir: str, etag: bool, packages: int) -> List[str]:
+    """在一个新的镜像和result目录上依次执行所有下载场景，返回失败项的描述"""
+    errors = []
+    mirror = os.path.join(work_dir, "mirror")
+    result_dir = os.path.join(work_dir, "result")
+    main_text = _main_sources(work_dir, packages, 1)
+    contrib_count = 3
+    _write_xz(mirror, "main", main_text)
+    _write_xz(mirror, "contrib", _contrib_sources(contrib_count))
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _MirrorHandler)
+    httpd.root = mirror
+    httpd.etag = etag
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}/dists/{{suite}}/{{component}}/source/Sources.xz"
+    sources_file = os.path.join(result_dir, "Sources")
+
+    def run(components: List[str], force: bool = False):
+        """模拟一次新的运行：用新的分析器执行init，返回 (是否更新, 本次的请求, 分析器)"""
+        analyzer = PackageDependencyAnalyzer()
+        analyzer.result_dir = result_dir
+        analyzer.sources_file = sources_file
+        analyzer.suite = SUITE
+        analyzer.components = components
+        analyzer.sources_url = url
+        httpd.requests.clear()
+        updated = analyzer.init(force)
+        return updated, list(httpd.requests), analyzer
+
+    def statuses(requests) -> List[int]:
+        return [status for _, status, _ in requests]
+
+    def read_meta() -> dict:
+        with open(sources_file + ".meta", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    main_url = url.format(suite=SUITE, component="main")
+    contrib_url = url.format(suite=SUITE, component="contrib")
+    main_count = main_text.count(b"\nPackage: ") + main_text.startswith(b"Package: ")
+    try:
+        # 首次下载
+        updated, requests, analyzer = run(["main"])
+        print(f"首次下载: 更新 {updated}, 请求 {requests}")
+        _check(errors, "首次下载返回200且Sources被更新", updated and statuses(requests) == [200], str(requests))
+        meta = read_meta() if os.path.exists(sources_file + ".meta") else {}
+        _check(errors, "Sources.meta记录下载地址和缓存头",
+               meta.get('urls') == [main_url] and bool(meta.get('last_modified')) and
+               (bool(meta.get('etag')) == etag), str(meta))
+        _check(errors, "边下载边解析并写入快照",
+               len(analyzer._packages or ()) == main_count and os.path.exists(sources_file + ".cache"),
+               f"{len(analyzer._packages or ())} != {main_count}")
+
+        # 未变化时的第二次运行
+        before = _file_states(sources_file)
+        updated, requests, analyzer = run(["main"])
+        print(f"第二次运行: 更新 {updated}, 请求 {requests}")
+        _check(errors, "未变化时发送条件请求并得到304",
+               not updated and statuses(requests) == [304] and requests[0][2], str(requests))
+        _check(errors, "304时Sources、Sources.meta和快照不变", _file_states(sources_file) == before,
+               f"{before} != {_file_states(sources_file)}")
+        _check(errors, "304时计入download_not_modified",
+               analyzer.stats.counters.get("download_not_modified") == 1 and not analyzer.stats.counters.get("downloads"),
+               str(dict(analyzer.stats.counters)))
+
+        # 强制下载
+        updated, requests, _ = run(["main"], force=True)
+        print(f"强制下载: 更新 {updated}, 请求 {requests}")
+        _check(errors, "强制下载不带条件并重新写入Sources",
+               updated and statuses(requests) == [200] and not requests[0][2] and
+               _file_states(sources_file)['Sources'] != before['Sources'], str(requests))
+
+        # 镜像上的文件更新（mtime向后调整，Last-Modified以秒为单位）
+        changed_text = _main_sources(work_dir, packages + 7, 2)
+        _write_xz(mirror, "main", changed_text, os.stat(sources_file).st_mtime + 10)
+        updated, requests, analyzer = run(["main"])
+        changed_count = changed_text.count(b"\nPackage: ") + changed_text.startswith(b"Package: ")
+        print(f"镜像更新后: 更新 {updated}, 请求 {requests}")
+        _check(errors, "镜像更新后重新下载", updated and statuses(requests) == [200] and requests[0][2], str(requests))
+        _check(errors, "更新后的Sources包含新的源码包", len(analyzer._get_packages()) == changed_count,
+               f"{len(analyzer._get_packages())} != {changed_count}")
+
+        # 组件列表 main -> main,contrib
+        updated, requests, analyzer = run(["main", "contrib"])
+        print(f"增加contrib: 更新 {updated}, 请求 {requests}")
+        packages_now = analyzer._get_packages()
+        _check(errors, "增加组件后由所有组件重建Sources",
+               updated and statuses(requests) == [200, 200] and len(packages_now) == changed_count + contrib_count and
+               "contrib-tool0" in packages_now, f"{requests}, {len(packages_now)} 个源码包")
+        _check(errors, "Sources.meta记录组件地址列表", read_meta().get('urls') == [main_url, contrib_url], str(read_meta()))
+
+        before = _file_states(sources_file)
+        updated, requests, _ = run(["main", "contrib"])
+        print(f"组件不变: 更新 {updated}, 请求 {requests}")
+        _check(errors, "组件列表不变时各组件均为304且不重建",
+               not updated and statuses(requests) == [304, 304] and _file_states(sources_file) == before,
+               str(requests))
+
+        # 组件列表 main,contrib -> main：main本身未变，但Sources是由两个组件合并的，必须重建
+        updated, requests, analyzer = run(["main"])
+        packages_now = analyzer._get_packages()
+        print(f"去掉contrib: 更新 {updated}, 请求 {requests}")
+        _check(errors, "去掉组件后重建Sources且不含该组件的源码包",
+               updated and len(packages_now) == changed_count and "contrib-tool0" not in packages_now,
+               f"{requests}, {len(packages_now)} 个源码包")
+        _check(errors, "Sources.meta恢复为单个组件", read_meta().get('urls') == [main_url], str(read_meta()))
+
+        # 再改回 main,contrib：各组件的缓存均未过期（304），但Sources只含main，仍须重新合并
+        updated, requests, analyzer = run(["main", "contrib"])
+        packages_now = analyzer._get_packages()
+        print(f"再次增加contrib: 更新 {updated}, 请求 {requests}")
+        _check(errors, "组件未变化但组件列表不同时重新合并Sources",
+               updated and statuses(requests) == [304, 304] and len(packages_now) == changed_count + contrib_count,
+               f"{requests}, {len(packages_now)} 个源码包")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the incremental Sources.xz download against a local HTTP mirror")
+    parser.add_argument("--packages", type=int, default=200, help="main组件的源码包数（默认200）")
+    parser.add_argument("--work-dir", help="镜像和result目录的上级目录（默认使用临时目录并在结束后删除）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pda-download-")
+    errors = []
+    try:
+        for etag in (True, False):
+            label = "ETag" if etag else "Last-Modified"
+            print(f"\n服务器发送 {label}:")
+            scenario_dir = os.path.join(work_dir, label.lower())
+            os.makedirs(scenario_dir, exist_ok=True)
+            errors += [f"{label}: {error}" for error in run_scenario(scenario_dir, etag, args.packages)]
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if errors:
+        print(f"\n{len(errors)} 项检查失败")
+        return 1
+    print("\n增量下载检查全部通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Consistency check for the incremental index and ranking updates
+
+Generates a synthetic Sources file with generate_sources.py and a perturbed
+copy of it (removed, added and modified source packages: Build-Depends edges,
+Binary lists and Architecture: all switches), then checks that
+
+  * diff_archive's patched reverse index equals a reverse index rebuilt from
+    the new Sources file,
+  * diff_archive's incremental impact ranking equals a full impact_ranking of
+    the new Sources file, and its impact changes equal the difference of the
+    two full rankings,
+  * the impact ranking does not depend on rank_block_size,
+  * the affected counts of the ranking equal the number of source packages a
+    per-package breadth-first traversal (analyze_many) reaches,
+
+for both no_all settings. Exits with status 1 on any mismatch, so it can run
+in CI next to benchmark_suite.py:
+
+    python3 check_incremental.py --packages 1500 --changes 40
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+from typing import Dict, List
+
+from generate_sources import SourcesShape, generate
+from package_dependency_analyzer import ImpactChange, PackageDependencyAnalyzer
+
+
+def _read_stanzas(path: str) -> List[List[str]]:
+    """把Sources文件拆成段落（每个段落为行列表，不含结尾换行）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [block.split('\n') for block in f.read().split('\n\n') if block.strip()]
+
+
+def _field(stanza: List[str], name: str) -> int:
+    """字段所在的行号，不存在时返回-1"""
+    prefix = name + ":"
+    for i, line in enumerate(stanza):
+        if line.startswith(prefix):
+            return i
+    return -1
+
+
+def perturb(source: str, output: str, changes: int, seed: int) -> Dict[str, int]:
+    """把source中的若干源码包删除、修改或复制成新包后写入output，返回各类修改的次数"""
+    rng = random.Random(seed)
+    stanzas = _read_stanzas(source)
+    binaries = [name.strip() for stanza in stanzas
+                for name in stanza[_field(stanza, "Binary")].split(":", 1)[1].split(",")]
+    counts = dict.fromkeys(("removed", "added", "depends_added", "depends_removed",
+                            "binary_added", "binary_removed", "arch_changed"), 0)
+
+    removed = set()
+    for _ in range(changes):
+        i = rng.randrange(len(stanzas))
+        if i in removed:
+            continue
+        stanza = stanzas[i]
+        kind = rng.choice(list(counts))
+        if kind == "removed":
+            removed.add(i)
+        elif kind == "added":
+            name = f"newsrc{counts['added']}"
+            copy = list(stanza)
+            copy[_field(copy, "Package")] = f"Package: {name}"
+            copy[_field(copy, "Binary")] = f"Binary: {name}-bin"
+            copy[_field(copy, "Build-Depends")] += f", {rng.choice(binaries)}"
+            stanzas.append(copy)
+            binaries.append(f"{name}-bin")
+        elif kind == "depends_added":
+            stanza[_field(stanza, "Build-Depends")] += f", {rng.choice(binaries)}"
+        elif kind == "depends_removed":
+            line = _field(stanza, "Build-Depends")
+            relations = stanza[line].split(":", 1)[1].split(",")
+            if len(relations) < 2:
+                continue
+            del relations[rng.randrange(len(relations))]
+            stanza[line] = "Build-Depends:" + ",".join(relations)
+        elif kind == "binary_added":
+            name = stanza[_field(stanza, "Package")].split(":", 1)[1].strip()
+            stanza[_field(stanza, "Binary")] += f", {name}-extra{i}"
+            binaries.append(f"{name}-extra{i}")
+        elif kind == "binary_removed":
+            line = _field(stanza, "Binary")
+            names = stanza[line].split(":", 1)[1].split(",")
+            if len(names) < 2:
+                continue
+            del names[rng.randrange(len(names))]
+            stanza[line] = "Binary:" + ",".join(names)
+        else:
+            line = _field(stanza, "Architecture")
+            stanza[line] = "Architecture: any" if stanza[line].endswith(" all") else "Architecture: all"
+        counts[kind] += 1
+
+    with open(output, 'w', encoding='utf-8') as f:
+        for i, stanza in enumerate(stanzas):
+            if i not in removed:
+                f.write('\n'.join(stanza) + '\n\n')
+    return counts
+
+
+def _fresh(sources_file: str) -> PackageDependencyAnalyzer:
+    analyzer = PackageDependencyAnalyzer()
+    analyzer.sources_file = sources_file
+    return analyzer
+
+
+def _rows(ranking) -> Dict[tuple, tuple]:
+    return {(row.kind, row.package): tuple(row) for row in ranking}
+
+
+def _report(errors: List[str], label: str, mismatches: List[str]):
+    """记录并打印一项检查的结果，只显示前几个不一致之处"""
+    if mismatches:
+        errors.append(f"{label}: {len(mismatches)} 处不一致")
+        print(f"  {label}: {len(mismatches)} 处不一致")
+        for mismatch in mismatches[:5]:
+            print(f"    {mismatch}")
+    else:
+        print(f"  {label}: 一致")
+
+
+def _compare_rows(expected: Dict[tuple, tuple], actual: Dict[tuple, tuple]) -> List[str]:
+    return [f"{key}: {expected.get(key)} != {actual.get(key)}"
+            for key in sorted(set(expected) | set(actual)) if expected.get(key) != actual.get(key)]
+
+
+def check(old_file: str, new_file: str, work_dir: str, no_all: str, block_sizes: List[int]) -> List[str]:
+    """对一组新旧Sources执行所有检查，返回不一致项的描述"""
+    errors = []
+
+    # 全量：新归档从头解析、建索引、计算排名
+    full = _fresh(new_file)
+    full_ranking = full.impact_ranking(no_all)
+    full_index = full._get_reverse_index()
+    old_ranking = _fresh(old_file).impact_ranking(no_all)
+
+    # 增量：新归档的副本（没有快照和排名缓存）由旧归档的索引和排名更新
+    incremental_file = os.path.join(work_dir, f"Sources.incremental-{no_all}")
+    shutil.copy(new_file, incremental_file)
+    incremental = _fresh(incremental_file)
+    diff = incremental.diff_archive(old_file, no_all)
+    print(f"  {len(diff.added_packages)} 个新增, {len(diff.removed_packages)} 个删除, "
+          f"{len(diff.changed_packages)} 个修改的源码包, {len(diff.added_edges)} 条新增和 "
+          f"{len(diff.removed_edges)} 条删除的依赖边, {len(diff.impact_changes)} 个包的影响变化")
+
+    index = incremental._reverse_index
+    _report(errors, "反向索引（增量 vs 全量，含依赖者顺序）",
+            [f"{name}: {index.get(name)} != {full_index.get(name)}"
+             for name in sorted(set(index) | set(full_index)) if index.get(name) != full_index.get(name)])
+
+    full_rows = _rows(full_ranking)
+    _report(errors, "影响排名（增量 vs 全量）",
+            _compare_rows(full_rows, _rows(incremental.impact_ranking(no_all))))
+
+    old_rows = _rows(old_ranking)
+    expected_changes = set()
+    for key in set(old_rows) | set(full_rows):
+        old_row, new_row = old_rows.get(key), full_rows.get(key)
+        if old_row is None or new_row is None or old_row[3:] != new_row[3:]:
+            expected_changes.add(ImpactChange(
+                key[1], key[0], old_row[3] if old_row else None, new_row[3] if new_row else None,
+                old_row[4] if old_row else None, new_row[4] if new_row else None))
+    actual_changes = set(diff.impact_changes)
+    _report(errors, "影响变化（diff vs 两次全量排名之差）",
+            [f"缺少 {change}" for change in expected_changes - actual_changes] +
+            [f"多出 {change}" for change in actual_changes - expected_changes])
+
+    # 分块计算：不同的rank_block_size得到相同的排名
+    for block_size in block_sizes:
+        blocked = _fresh(new_file)
+        blocked.rank_block_size = block_size
+        blocked._store_ranking = lambda key, ranking, blocked=blocked: blocked._rankings.__setitem__(key, ranking)
+        _report(errors, f"影响排名（rank_block_size={block_size} vs 默认）",
+                _compare_rows(full_rows, _rows(blocked.impact_ranking(no_all))))
+
+    # 逐个包的广度优先遍历：受影响源码包数与排名相同（源码包不计自身）
+    mismatches = []
+    for (kind, package), row in full_rows.items():
+        results = full.analyze_many([package], kind, no_all)
+        affected = len(results) - (package in results if kind == "source" else 0)
+        if affected != row[3]:
+            mismatches.append(f"{kind} {package}: 排名 {row[3]}, 遍历 {affected}")
+    _report(errors, f"受影响源码包数（排名 vs 逐个遍历 {len(full_rows)} 个包）", mismatches)
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check incremental index/ranking updates against a full rebuild")
+    parser.add_argument("--packages", type=int, default=1500, help="合成数据集的源码包数（默认1500）")
+    parser.add_argument("--changes", type=int, default=40, help="对新归档做的修改次数（默认40）")
+    parser.add_argument("--cycles", type=int, default=SourcesShape().cycles, help="合成数据集的构建依赖环数")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--block-sizes", default="1,64", help="额外比较的rank_block_size，逗号分隔（默认 1,64）")
+    parser.add_argument("--work-dir", help="生成数据的目录（默认使用临时目录并在结束后删除）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pda-check-")
+    os.makedirs(work_dir, exist_ok=True)
+    errors = []
+    try:
+        old_file = os.path.join(work_dir, "Sources.old")
+        new_file = os.path.join(work_dir, "Sources.new")
+        generate(old_file, SourcesShape(packages=args.packages, cycles=args.cycles, seed=args.seed))
+        counts = perturb(old_file, new_file, args.changes, args.seed)
+        print(f"已生成 {args.packages} 个源码包的归档及其修改版本: "
+              + ", ".join(f"{kind} {count}" for kind, count in counts.items()))
+
+        block_sizes = [int(value) for value in args.block_sizes.split(",") if value.strip()]
+        for no_all in ("yes", "no"):
+            print(f"\nno_all={no_all}:")
+            errors += check(old_file, new_file, work_dir, no_all, block_sizes)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if errors:
+        print(f"\n检测到 {len(errors)} 项不一致")
+        return 1
+    print("\n增量更新与全量计算一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
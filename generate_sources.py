@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Synthetic Debian Sources generator
+
+Writes a Sources file with a tunable number of source packages, binaries per
+source, Build-Depends fan-out, dependency depth, hub packages (debhelper-like
+packages that most sources build-depend on) and build-dependency cycles.
+Relations use the full Debian syntax (version constraints, architecture
+restrictions, build profiles, alternatives), and each stanza carries the usual
+unused fields so parsing cost is close to a real mirror file.
+
+The output is deterministic for a given set of options and seed, so it can be
+used as a benchmark input in CI, e.g.:
+
+    python3 generate_sources.py --packages 40000 --output result/Sources.synthetic
+"""
+
+import argparse
+import random
+import sys
+from typing import Dict, List, NamedTuple
+
+
+class SourcesShape(NamedTuple):
+    """生成的Sources文件的形状参数"""
+    packages: int = 1000        # 源码包数
+    binaries: int = 3           # 每个源码包最多产生的二进制包数（1到该值之间随机）
+    fan_out: int = 6            # 每个源码包平均的构建依赖数（不含hub依赖）
+    depth: int = 10             # 依赖层数：第L层的源码包只构建依赖更低层的包，决定最长依赖链条
+    hubs: int = 5               # 第0层中被大量源码包依赖的包数
+    hub_ratio: float = 0.8      # 每个源码包依赖某个hub的概率
+    cycles: int = 20            # 额外加入的构建依赖环数
+    all_ratio: float = 0.2      # Architecture: all 的源码包比例
+    syntax_ratio: float = 0.3   # 带版本/架构/构建配置限制或可选依赖的关系比例
+    seed: int = 1
+
+
+def _relation(rng: random.Random, name: str, alternatives: List[List[str]], syntax_ratio: float) -> str:
+    """给依赖名加上随机的Debian关系语法；可选依赖从alternatives（更低层源码包的二进制包）中选取"""
+    if rng.random() >= syntax_ratio:
+        return name
+    kind = rng.randrange(5)
+    if kind == 0:
+        return f"{name} (>= {rng.randint(1, 9)}.{rng.randint(0, 20)})"
+    if kind == 1:
+        return f"{name} [{rng.choice(['amd64 arm64', '!hurd-any', 'linux-any', 'amd64'])}]"
+    if kind == 2:
+        return f"{name} <{rng.choice(['!nocheck', '!nodoc', 'cross'])}>"
+    if kind == 3:
+        return f"{name}:native"
+    return f"{name} | {rng.choice(rng.choice(alternatives))}"
+
+
+def generate(output: str, shape: SourcesShape = SourcesShape()) -> Dict[str, int]:
+    """按shape生成Sources文件，返回统计信息（源码包、二进制包、依赖关系数）"""
+    rng = random.Random(shape.seed)
+    count = max(1, shape.packages)
+    depth = max(1, min(shape.depth, count))
+
+    # 每个源码包所在的层；hub固定在第0层
+    layers = [min(depth - 1, i * depth // count) for i in range(count)]
+    layer_start = {}
+    for i, layer in enumerate(layers):
+        layer_start.setdefault(layer, i)
+    hubs = list(range(min(shape.hubs, layer_start.get(1, count))))
+
+    binaries = [[f"lib{i}-{j}" for j in range(rng.randint(1, max(1, shape.binaries)))] for i in range(count)]
+    all_binaries = [binary for names in binaries for binary in names]
+
+    # 构建依赖：主要依赖上一层（保证链条足够深），其余随机依赖任意更低的层
+    dependencies = []
+    for i in range(count):
+        deps = []
+        if layers[i] > 0:
+            if hubs and rng.random() < shape.hub_ratio:
+                deps.append(rng.choice(binaries[rng.choice(hubs)]))
+            previous = layer_start[layers[i] - 1]
+            for k in range(rng.randint(0, 2 * shape.fan_out)):
+                upper = layer_start[layers[i]] - 1
+                lower = previous if k == 0 else 0
+                deps.append(rng.choice(binaries[rng.randint(lower, upper)]))
+        dependencies.append(deps)
+
+    # 构建依赖环：让上一层中被依赖的源码包反过来构建依赖依赖它的源码包。
+    # 只在相邻层之间加反向边，hub也不参与，否则几个环就会把大部分源码包连成一个强连通分量
+    hub_set = set(hubs)
+    owners = {binary: i for i, names in enumerate(binaries) for binary in names}
+    candidates = [i for i in range(count) if layers[i] > 0 and i not in hub_set]
+    for _ in range(min(shape.cycles, len(candidates))):
+        dependent = rng.choice(candidates)
+        targets = [owners[dep] for dep in dependencies[dependent]
+                   if owners[dep] not in hub_set and layers[owners[dep]] == layers[dependent] - 1]
+        if targets:
+            dependencies[rng.choice(targets)].append(binaries[dependent][0])
+
+    relation_count = 0
+    with open(output, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            name = f"src{i}"
+            arch = 'all' if rng.random() < shape.all_ratio else rng.choice(['any', 'linux-any', 'amd64 arm64'])
+            lower_layers = binaries[:max(1, layer_start[layers[i]])]
+            relations = [_relation(rng, dep, lower_layers, shape.syntax_ratio) for dep in dependencies[i]]
+            relation_count += len(relations)
+
+            f.write(f"Package: {name}\n")
+            f.write(f"Binary: {', '.join(binaries[i])}\n")
+            f.write(f"Version: {rng.randint(0, 9)}.{rng.randint(0, 99)}-{rng.randint(1, 5)}\n")
+            f.write(f"Maintainer: Maintainer {i} <maint{i}@example.org>\n")
+            f.write(f"Architecture: {arch}\n")
+            f.write("Standards-Version: 4.7.0\n")
+            f.write("Format: 3.0 (quilt)\n")
+            f.write("Build-Depends: debhelper-compat (= 13)" + "".join(f", {r}" for r in relations) + "\n")
+            f.write(f"Homepage: https://example.org/{name}\n")
+            f.write(f"Vcs-Git: https://salsa.debian.org/debian/{name}.git\n")
+            f.write(f"Directory: pool/main/{name[0]}/{name}\n")
+            f.write("Priority: optional\n")
+            f.write(f"Section: {rng.choice(['libs', 'devel', 'utils', 'python', 'net', 'admin'])}\n")
+            f.write("Package-List:\n")
+            for binary in binaries[i]:
+                f.write(f" {binary} deb libs optional arch={arch.replace(' ', ',')}\n")
+            for field in ("Files", "Checksums-Sha256"):
+                width = 32 if field == "Files" else 64
+                f.write(f"{field}:\n")
+                for suffix in (".dsc", ".orig.tar.xz", ".debian.tar.xz"):
+                    f.write(f" {rng.getrandbits(width * 4):0{width}x} {rng.randint(1000, 9999999)} {name}_1.0{suffix}\n")
+            f.write("\n")
+
+    return {'sources': count, 'binaries': len(all_binaries), 'relations': relation_count}
+
+
+def main():
+    defaults = SourcesShape()
+    parser = argparse.ArgumentParser(description="Generate a synthetic Debian Sources file")
+    parser.add_argument("-o", "--output", required=True, help="输出的Sources文件路径")
+    parser.add_argument("--packages", type=int, default=defaults.packages, help="源码包数")
+    parser.add_argument("--binaries", type=int, default=defaults.binaries, help="每个源码包最多产生的二进制包数")
+    parser.add_argument("--fan-out", type=int, default=defaults.fan_out, help="每个源码包平均的构建依赖数")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="依赖层数（最长依赖链条的长度）")
+    parser.add_argument("--hubs", type=int, default=defaults.hubs, help="被大量源码包依赖的包数")
+    parser.add_argument("--hub-ratio", type=float, default=defaults.hub_ratio, help="每个源码包依赖某个hub的概率")
+    parser.add_argument("--cycles", type=int, default=defaults.cycles, help="额外加入的构建依赖环数")
+    parser.add_argument("--all-ratio", type=float, default=defaults.all_ratio, help="Architecture: all 的源码包比例")
+    parser.add_argument("--syntax-ratio", type=float, default=defaults.syntax_ratio,
+                        help="带版本/架构/构建配置限制或可选依赖的关系比例")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="随机种子")
+    args = parser.parse_args()
+
+    shape = SourcesShape(args.packages, args.binaries, args.fan_out, args.depth, args.hubs, args.hub_ratio,
+                         args.cycles, args.all_ratio, args.syntax_ratio, args.seed)
+    stats = generate(args.output, shape)
+    print(f"已生成 {args.output}: {stats['sources']} 个源码包, {stats['binaries']} 个二进制包, "
+          f"{stats['relations']} 个构建依赖关系")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
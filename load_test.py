@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Load test for the PackageDependencyAnalyzer query server
+
+Sends concurrent queries to a running `package_dependency_analyzer.py --serve`
+instance and reports throughput and p50/p90/p99 latency, separately for the
+first (uncached) and repeated (cached) round of queries.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+
+def _request(url: str) -> Tuple[float, Optional[str]]:
+    """发送一次查询，返回 (耗时秒数, 错误信息)"""
+    start = time.perf_counter()
+    try:
+        # 只读取响应体，不解析JSON：大结果的解析会占用客户端的GIL，干扰延迟测量
+        with urllib.request.urlopen(url) as response:
+            response.read()
+        error = None
+    except urllib.error.URLError as e:
+        error = str(e)
+    return time.perf_counter() - start, error
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _run_round(name: str, urls: List[str], concurrency: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(_request, urls))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    print(f"{name}: {len(urls)} 个请求, 并发 {concurrency}, 耗时 {elapsed:.2f}s, "
+          f"吞吐 {len(urls) / elapsed:.1f} 请求/秒, 失败 {len(errors)} 个")
+    if latencies:
+        print(f"  延迟 p50 {_percentile(latencies, 50) * 1000:.1f} ms, "
+              f"p90 {_percentile(latencies, 90) * 1000:.1f} ms, "
+              f"p99 {_percentile(latencies, 99) * 1000:.1f} ms, "
+              f"平均 {statistics.mean(latencies) * 1000:.1f} ms, 最大 {latencies[-1] * 1000:.1f} ms")
+    if errors:
+        print(f"  首个错误: {errors[0]}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the query server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="查询服务地址")
+    parser.add_argument("--mode", choices=["binary", "source", "info"], default="binary", help="查询类型")
+    parser.add_argument("--requests", type=int, default=200, help="每轮请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("targets", nargs="*", default=["debhelper", "cmake", "libssl-dev", "python3-all", "qtbase5-dev"],
+                        help="查询的包名，依次轮流使用")
+    args = parser.parse_args()
+
+    param = "package" if args.mode == "info" else "targets"
+    urls = [f"{args.url}/{args.mode}?{urllib.parse.urlencode({param: target})}" for target in args.targets]
+    urls = (urls * (args.requests // len(urls) + 1))[:args.requests]
+
+    # 第一轮：每个目标首次查询未命中缓存；第二轮：全部命中缓存
+    errors = _run_round("第一轮（含未缓存查询）", urls, args.concurrency)
+    errors += _run_round("第二轮（缓存命中）", urls, args.concurrency)
+
+    with urllib.request.urlopen(f"{args.url}/status") as response:
+        status = json.load(response)
+    print(f"服务状态: 缓存命中 {status['cache_hits']} 次, 未命中 {status['cache_misses']} 次")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,145 +2,1523 @@
 """
 Debian Package Dependency Analyzer
 
-This script analyzes package dependencies from Debian trixie Sources.xz file.
+This script analyzes package dependencies from Debian Sources.xz files
+(trixie/main by default; several suites and components can be combined).
 """
 
 import os
-import shutil
+import argparse
+import bisect
+import contextlib
+import csv
+import gc
 import gzip
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import logging
 import lzma
+import marshal
+import mmap
+import multiprocessing
+import struct
+import threading
+import tracemalloc
+import urllib.error
+import urllib.parse
 import urllib.request
 import re
-import pandas as pd
+import shutil
+import sys
+import time
+from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
-from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple, Tuple, Optional
+from collections import OrderedDict, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("package_dependency_analyzer")
+server_logger = logging.getLogger("package_dependency_analyzer.server")
+
+
+class SourcePackage:
+    """Sources文件中单个源码包的精简记录，只保留分析器用到的字段"""
+    
+    __slots__ = ('name', 'binaries', 'build_depends', 'build_depends_indep',
+                 'architecture', 'section', 'homepage')
+    
+    def __init__(self, name: str, binaries: Tuple[str, ...] = (), build_depends: Optional[str] = None,
+                 build_depends_indep: Optional[str] = None, architecture: Optional[str] = None,
+                 section: Optional[str] = None, homepage: Optional[str] = None):
+        self.name = name
+        self.binaries = binaries
+        self.build_depends = build_depends
+        self.build_depends_indep = build_depends_indep
+        self.architecture = architecture
+        self.section = section
+        self.homepage = homepage
+
+
+class DependencyChain:
+    """依赖链条 "目标 -> 源码包1 -> 源码包2 -> ..." 的末端节点
+    
+    链条以父指针树存储：每个节点只保存最后一个包名和指向前缀链条的引用，
+    同一目标出发、前缀相同的链条共享前缀节点；包名引用包表中的同一个字符串对象，不为每条链条复制。
+    只在输出时通过str()拼接成字符串。
+    哈希值在构造节点时由前缀的哈希值和包名算出，比较和去重不需要沿父指针重建包名元组。
+    """
+    
+    __slots__ = ('package', 'parent', 'length', '_hash')
+    
+    def __init__(self, package: str, parent: Optional['DependencyChain'] = None):
+        self.package = package
+        self.parent = parent
+        if parent is None:
+            self.length = 1
+            self._hash = hash((package,))
+        else:
+            self.length = parent.length + 1
+            self._hash = hash((parent._hash, package))
+    
+    def packages(self) -> Tuple[str, ...]:
+        """从目标到末端的包名"""
+        names = []
+        node = self
+        while node is not None:
+            names.append(node.package)
+            node = node.parent
+        return tuple(reversed(names))
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DependencyChain):
+            return NotImplemented
+        if self._hash != other._hash or self.length != other.length:
+            return False
+        # 逐个节点比较，遇到共享的前缀节点即可停止
+        node = self
+        while node is not other:
+            if node.package != other.package:
+                return False
+            node, other = node.parent, other.parent
+        return True
+    
+    def __hash__(self) -> int:
+        return self._hash
+    
+    def __reduce__(self):
+        # 字符串的哈希值在不同进程中不同，反序列化时重新构造节点以重新计算哈希值
+        return DependencyChain, (self.package, self.parent)
+    
+    def __str__(self) -> str:
+        return ' -> '.join(self.packages())
+    
+    def __repr__(self) -> str:
+        return f"DependencyChain({str(self)!r})"
+
+
+def render_chains(chains: List[DependencyChain]) -> List[str]:
+    """把依赖链条渲染为输出用的字符串"""
+    return [str(chain) for chain in chains]
+
+
+# 解析Sources时保留的字段：Sources字段名 -> SourcePackage属性名
+SOURCE_FIELDS = {
+    'Package': 'name',
+    'Binary': 'binaries',
+    'Build-Depends': 'build_depends',
+    'Build-Depends-Indep': 'build_depends_indep',
+    'Architecture': 'architecture',
+    'Section': 'section',
+    'Homepage': 'homepage',
+}
+
+
+class Relation(NamedTuple):
+    """Build-Depends中的单个依赖项，例如 libfoo-dev:native (>= 1.2) [amd64 !i386] <!nocheck>"""
+    name: str
+    arch_qualifier: Optional[str] = None        # :any / :native
+    version_op: Optional[str] = None            # << <= = >= >>
+    version: Optional[str] = None
+    archs: Tuple[str, ...] = ()                 # 架构限制，! 开头表示排除
+    profiles: Tuple[Tuple[str, ...], ...] = ()  # 构建配置限制，每组 <...> 为一个列表
+
+
+_RELATION_RE = re.compile(r"""
+    \s*(?P<name>[^\s:(\[<]+)
+    (?::(?P<qualifier>[^\s(\[<]+))?
+    \s*(?:\(\s*(?P<op><<|<=|=|>=|>>|<|>)\s*(?P<version>[^)\s]+)\s*\))?
+    \s*(?:\[(?P<archs>[^\]]*)\])?
+    \s*(?P<profiles>(?:<[^>]*>\s*)*)
+    $""", re.VERBOSE)
+_PROFILE_RE = re.compile(r'<([^>]*)>')
+# 整个依赖字段按依赖项逐个匹配；分组与_RELATION_RE相同，另加依赖项后的分隔符（, 或 | 或字段结尾）
+_RELATIONS_RE = re.compile(r"""
+    \s*(?P<name>[^\s,|:(\[<]+)
+    (?::(?P<qualifier>[^\s,|(\[<]+))?
+    \s*(?:\(\s*(?P<op><<|<=|=|>=|>>|<|>)\s*(?P<version>[^)\s]+)\s*\))?
+    \s*(?:\[(?P<archs>[^\]]*)\])?
+    \s*(?P<profiles>(?:<[^>]*>\s*)*)
+    (?P<sep>[,|]|\Z)""", re.VERBOSE)
+
+
+_SIMPLE_RELATION_RE = re.compile(r'[\s:(\[<$]')
+_new_tuple = tuple.__new__
+
+
+@lru_cache(maxsize=None)
+def _parse_relation(atom: str) -> Optional[Relation]:
+    """解析单个依赖项；大量源码包共享相同的依赖项（如 debhelper-compat (= 13)），结果按字符串缓存"""
+    atom = atom.strip()
+    if not _SIMPLE_RELATION_RE.search(atom):  # 最常见的情况：只有包名，跳过正则和NamedTuple默认参数处理
+        return _new_tuple(Relation, (sys.intern(atom), None, None, None, (), ())) if atom else None
+    
+    match = _RELATION_RE.match(atom)
+    if match is None or match.group('name').startswith('$'):  # 无法解析或为替换变量
+        return None
+    archs = match.group('archs')
+    profiles = match.group('profiles')
+    return Relation(
+        name=sys.intern(match.group('name')),
+        arch_qualifier=match.group('qualifier'),
+        version_op=match.group('op'),
+        version=match.group('version'),
+        archs=tuple(archs.split()) if archs else (),
+        profiles=tuple(tuple(group.split()) for group in _PROFILE_RE.findall(profiles)) if profiles else (),
+    )
+
+
+@lru_cache(maxsize=None)
+def parse_relations(dep_string: str) -> Tuple[Tuple[Relation, ...], ...]:
+    """解析Debian依赖关系字段，返回依赖组列表，每组为以 | 分隔的可选依赖
+    
+    整个字段用一个正则逐项匹配；字段中有无法解析的依赖项时（匹配不连续），改为逐项解析并跳过这些依赖项。
+    """
+    groups = []
+    alternatives = []
+    position = 0
+    for match in _RELATIONS_RE.finditer(dep_string):
+        if match.start() != position:
+            break
+        position = match.end()
+        name, qualifier, op, version, archs, profiles, sep = match.groups()
+        if name[0] != '$':  # 替换变量
+            alternatives.append(_new_tuple(Relation, (
+                sys.intern(name), qualifier, op, version,
+                tuple(archs.split()) if archs else (),
+                tuple(tuple(group.split()) for group in _PROFILE_RE.findall(profiles)) if profiles else (),
+            )))
+        if sep != '|':
+            if alternatives:
+                groups.append(tuple(alternatives))
+                alternatives = []
+            if not sep:
+                return tuple(groups)
+    if not dep_string[position:].strip():
+        return tuple(groups)
+    
+    groups = []
+    for group in dep_string.split(','):
+        if '|' in group:
+            alternatives = tuple(relation for relation in map(_parse_relation, group.split('|')) if relation)
+        else:
+            relation = _parse_relation(group)
+            alternatives = (relation,) if relation else ()
+        if alternatives:
+            groups.append(alternatives)
+    return tuple(groups)
+
+
+# 字段开头或 , | 之后的第一个词即为包名；版本、架构和构建配置限制中不会出现 , 和 |，替换变量（$开头）不匹配
+_RELATION_NAME_RE = re.compile(r'(?:^|[,|])\s*([^\s,|:(\[<$][^\s,|:(\[<]*)')
+
+
+@lru_cache(maxsize=None)
+def relation_names(dep_string: str) -> Tuple[str, ...]:
+    """只提取依赖字段中的包名（包含 | 分隔的所有可选依赖），不构造Relation
+    
+    与parse_relations得到的包名相同，但整串只交给正则findall一次，用于不需要按架构/构建配置过滤时快速建立索引；
+    许多源码包的Build-Depends完全相同，结果按字符串缓存。
+    """
+    return tuple(_RELATION_NAME_RE.findall(dep_string))
+
+
+def clear_relation_caches():
+    """清空依赖字段的解析缓存（按依赖字段字符串缓存，不会自行淘汰）
+    
+    缓存只在建立索引时使用；常驻进程加载新的Sources后，旧字段的结果不再需要，应清空以免内存随更新不断增长。
+    """
+    parse_relations.cache_clear()
+    _parse_relation.cache_clear()
+    relation_names.cache_clear()
+    filtered_relation_names.cache_clear()
+    _restrictions_apply.cache_clear()
+
+
+def _split_arch(arch: str) -> Tuple[str, str]:
+    """把Debian架构名拆成 (操作系统, CPU)，例如 amd64 -> (linux, amd64)，hurd-i386 -> (hurd, i386)"""
+    os_name, sep, cpu = arch.partition('-')
+    return (os_name, cpu) if sep else ('linux', arch)
+
+
+def arch_matches(arch: str, pattern: str) -> bool:
+    """判断架构是否匹配架构名或通配符（any、linux-any、any-amd64 等）"""
+    if pattern == arch or pattern == 'any':
+        return True
+    if '-' not in pattern:
+        return False
+    pattern_os, pattern_cpu = pattern.split('-', 1)
+    arch_os, arch_cpu = _split_arch(arch)
+    return pattern_os in ('any', arch_os) and pattern_cpu in ('any', arch_cpu)
+
+
+def relation_applies(relation: Relation, arch: Optional[str] = None,
+                     profiles: Optional[FrozenSet[str]] = None) -> bool:
+    """判断依赖项在指定架构和启用的构建配置下是否生效；arch/profiles为None时不按该条件过滤"""
+    if arch is not None and relation.archs:
+        negated = relation.archs[0].startswith('!')
+        matched = any(arch_matches(arch, item.lstrip('!')) for item in relation.archs)
+        if matched == negated:
+            return False
+    
+    if profiles is not None and relation.profiles:
+        # 任一组限制全部满足即生效；!profile 表示该配置未启用
+        return any(
+            all((term[1:] not in profiles) if term.startswith('!') else (term in profiles) for term in group)
+            for group in relation.profiles
+        )
+    
+    return True
+
+
+# 与_RELATION_NAME_RE相同地匹配包名，另外取出版本限制 (...) 之后的架构和构建配置限制
+_RELATION_RESTRICTIONS_RE = re.compile(r'(?:^|[,|])\s*([^\s,|:(\[<$][^\s,|:(\[<]*)[^,|(\[<]*(?:\([^)]*\)\s*)?([^,|]*)')
+_ARCHS_RE = re.compile(r'\[([^\]]*)\]')
+
+
+@lru_cache(maxsize=None)
+def filtered_relation_names(dep_string: str, arch: Optional[str] = None,
+                            profiles: Optional[FrozenSet[str]] = None) -> Tuple[str, ...]:
+    """与relation_names相同，但只保留在指定架构和启用的构建配置下生效的依赖项（见relation_applies）
+    
+    整串只交给正则findall一次，得到每个依赖项的包名及其限制；只有确实带架构限制 [...] 或构建配置限制 <...>
+    的依赖项才判断是否生效，其余依赖项直接保留。同一次运行中过滤条件不变，结果按(字段, 过滤条件)缓存。
+    """
+    if '[' not in dep_string and '<' not in dep_string:
+        return relation_names(dep_string)
+    return tuple([name for name, restrictions in _RELATION_RESTRICTIONS_RE.findall(dep_string)
+                  if not restrictions or _restrictions_apply(restrictions, arch, profiles)])
+
+
+@lru_cache(maxsize=None)
+def _restrictions_apply(restrictions: str, arch: Optional[str], profiles: Optional[FrozenSet[str]]) -> bool:
+    """依赖项的限制部分（如 "[amd64 !i386] <!nocheck>"）在指定条件下是否生效；常见的限制只有几种，结果缓存"""
+    archs = _ARCHS_RE.search(restrictions)
+    relation = _new_tuple(Relation, ('', None, None, None, tuple(archs.group(1).split()) if archs else (),
+                                     tuple(tuple(group.split()) for group in _PROFILE_RE.findall(restrictions))))
+    return relation_applies(relation, arch, profiles)
+
+
+@lru_cache(maxsize=None)
+def architecture_applies(architecture: Optional[str], arch: str) -> bool:
+    """源码包的Architecture字段（如 "any"、"linux-any all"）是否包含架构arch或all；不同的字段只有几十种，结果缓存"""
+    return any(item == 'all' or arch_matches(arch, item) for item in (architecture or 'any').split())
+
+
+# 预解析快照文件头：魔数、快照格式版本、Python版本（marshal格式与之相关）、
+# 对应Sources文件的大小、mtime(ns)和sha256
+SNAPSHOT_MAGIC = b'PDASNAP\x00'
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = struct.Struct('<8sHIQq32s')
+
+# iter_results每批构造的结果数：批内暂停GC，批与批之间把结果交给调用方
+RESULT_BATCH_SIZE = 1024
+
+
+def _iter_bits(mask: int):
+    """依次返回整数掩码中被置位的比特序号"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def strongly_connected_components(nodes, successors) -> List[Tuple[str, ...]]:
+    """Tarjan算法求有向图的强连通分量（迭代实现，深度很大的依赖图也不会超出递归限制）
+    
+    Args:
+        nodes: 图中所有节点
+        successors: 返回节点后继的函数
+        
+    Returns:
+        List: 强连通分量列表，按逆拓扑序排列（每个分量都排在它能到达的分量之后）
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    # 先深入子节点，之后回到node继续遍历剩余的后继
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors(child))))
+                    break
+                if child in on_stack and index[child] < lowlink[node]:
+                    lowlink[node] = index[child]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(tuple(component))
+    
+    return components
+
+
+class BuildOrder(NamedTuple):
+    """重建顺序：waves[i]为第i轮可以并行构建的单元，每个单元是一个强连通分量（环中的源码包需要一起引导构建）"""
+    waves: List[List[Tuple[str, ...]]]
+    cycles: List[Tuple[str, ...]]  # 构建依赖环（含自依赖的源码包）
+
+
+class ImpactRank(NamedTuple):
+    """整个归档影响排名中的一行"""
+    package: str
+    kind: str       # "source" 或 "binary"
+    source: str     # 二进制包所属的源码包；源码包为其本身
+    affected: int   # 直接或间接受影响的源码包数（源码包不计自身）
+    depth: int      # 受影响源码包的最长依赖链层数，即其后需要的重建轮数
+
+
+class ImpactChange(NamedTuple):
+    """两个归档之间影响发生变化的包；在某一侧不存在时对应的值为None"""
+    package: str
+    kind: str
+    old_affected: Optional[int]
+    new_affected: Optional[int]
+    old_depth: Optional[int]
+    new_depth: Optional[int]
+
+
+class ArchiveDiff(NamedTuple):
+    """两个Sources文件的差异，见diff_archive"""
+    added_packages: List[str]
+    removed_packages: List[str]
+    changed_packages: List[str]                 # Binary、Build-Depends(-Indep)或Architecture有变化
+    added_edges: List[Tuple[str, str]]          # (源码包, 新增的构建依赖名)
+    removed_edges: List[Tuple[str, str]]        # (源码包, 删除的构建依赖名)
+    added_binaries: List[Tuple[str, str]]       # (源码包, 新增的二进制包)
+    removed_binaries: List[Tuple[str, str]]     # (源码包, 删除的二进制包)
+    impact_changes: List[ImpactChange]          # 按影响变化量从大到小排序
+
+
+class SuiteImpact(NamedTuple):
+    """跨suite分析中一个受影响源码包在各suite中的情况，见SuiteSet.compare"""
+    package: str
+    affected_in: Tuple[str, ...]        # 受影响的suite
+    unaffected_in: Tuple[str, ...]      # 有该源码包但不受影响的suite
+    missing_in: Tuple[str, ...]         # 没有该源码包的suite
+    result: Dict[str, any]              # 第一个受影响的suite中的结果（分类、架构、主页、依赖链条）
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """暂停分代GC：反序列化只创建大量不含循环引用的容器，期间的GC扫描没有意义，还会明显拖慢加载"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    """本进程（或已结束的子进程中最大）的峰值常驻内存，平台不支持时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class RunStats:
+    """一次运行的结构化统计：各阶段的墙钟/CPU时间、计数器和峰值内存，summary()输出为可序列化的字典
+    
+    阶段可以嵌套（例如遍历时才按需构建依赖图），每个阶段只记录不属于其中嵌套阶段的时间，
+    因此各阶段相加就是被计时的总时间，不会重复计算。嵌套关系按线程记录；
+    查询服务中多个线程并发更新时，计数器和CPU时间只是近似值。
+    """
+    
+    def __init__(self):
+        self.phases = {}            # 阶段名 -> [墙钟时间, CPU时间, 次数]
+        self.counters = defaultdict(int)
+        self.worker_phases = {}     # 并行分析时工作进程中各阶段的合计
+        self._local = threading.local()
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+    
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """计时一个阶段"""
+        stack = self._stack()
+        nested = [0.0, 0.0]  # 嵌套阶段的墙钟/CPU时间
+        stack.append(nested)
+        start, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - start_cpu
+            stack.pop()
+            self._add(self.phases, name, wall - nested[0], cpu - nested[1], 1)
+            self._charge_parent(stack, wall, cpu)
+    
+    def record(self, name: str, wall: float, cpu: float, calls: int = 1):
+        """记录在阶段计时之外测得的时间（例如分散在其他阶段中的读取），从当前阶段中扣除"""
+        self._add(self.phases, name, wall, cpu, calls)
+        self._charge_parent(self._stack(), wall, cpu)
+    
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+    
+    @staticmethod
+    def _add(phases: Dict[str, List[float]], name: str, wall: float, cpu: float, calls: int):
+        entry = phases.get(name)
+        if entry is None:
+            phases[name] = [wall, cpu, calls]
+        else:
+            entry[0] += wall
+            entry[1] += cpu
+            entry[2] += calls
+    
+    @staticmethod
+    def _charge_parent(stack: List[List[float]], wall: float, cpu: float):
+        if stack:
+            stack[-1][0] += wall
+            stack[-1][1] += cpu
+    
+    def export(self) -> Tuple[Dict[str, List[float]], Dict[str, int]]:
+        """工作进程的统计，传回主进程后由merge_worker合并"""
+        return self.phases, dict(self.counters)
+    
+    def merge_worker(self, phases: Dict[str, List[float]], counters: Dict[str, int]):
+        """合并工作进程的统计：计数器直接相加，阶段时间单独汇总（与主进程的时间重叠）"""
+        for name, (wall, cpu, calls) in phases.items():
+            self._add(self.worker_phases, name, wall, cpu, calls)
+        for name, n in counters.items():
+            self.counters[name] += n
+    
+    @staticmethod
+    def _phase_table(phases: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+        return {name: {'wall': round(wall, 6), 'cpu': round(cpu, 6), 'calls': calls}
+                for name, (wall, cpu, calls) in sorted(phases.items(), key=lambda item: -item[1][0])}
+    
+    def summary(self) -> Dict[str, any]:
+        """各阶段（按耗时从大到小）、计数器、依赖字段解析缓存的命中情况和峰值内存"""
+        wall = time.perf_counter() - self._start
+        timed = sum(entry[0] for entry in self.phases.values())
+        caches = {}
+        for name, function in (('relation_names', relation_names), ('parse_relations', parse_relations),
+                               ('parse_relation', _parse_relation), ('filtered_relation_names', filtered_relation_names)):
+            info = function.cache_info()
+            caches[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+    
+        summary = {
+            'wall': round(wall, 6),
+            'cpu': round(time.process_time() - self._start_cpu, 6),
+            'untimed': round(wall - timed, 6),  # 不属于任何阶段的时间（参数解析、打印等）
+            'phases': self._phase_table(self.phases),
+            'counters': dict(sorted(self.counters.items())),
+            'caches': caches,
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+        if self.worker_phases:
+            summary['worker_phases'] = self._phase_table(self.worker_phases)
+            summary['worker_peak_rss_mb'] = _peak_rss_mb(children=True)
+        if tracemalloc.is_tracing():
+            summary['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        return summary
+
+
+class _TeeReader(io.RawIOBase):
+    """读取底层流的同时把数据写入sink并更新摘要，用于边解压边落盘边解析
+    
+    读取、解压和写入的时间记入stats的download阶段，与同时进行的解析分开统计。
+    """
+    
+    def __init__(self, source, sink, digest, stats: Optional[RunStats] = None):
+        self._source = source
+        self._sink = sink
+        self._digest = digest
+        self._stats = stats
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        start, start_cpu = time.perf_counter(), time.process_time()
+        data = self._source.read(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        self._sink.write(data)
+        self._digest.update(data)
+        if self._stats is not None:
+            self._stats.record("download", time.perf_counter() - start, time.process_time() - start_cpu, 0)
+        return size
+
+
+class ResultWriter(ABC):
+    """结果输出后端：逐行接收表格数据，close()时返回输出文件路径
+    
+    columns为表格的列；不指定时是受影响源码包的结果表（result_columns），用write()逐个写入分析结果。
+    影响排名、构建顺序、归档比较等其他表格指定自己的列，用write_row()写入以列名为键的字典。
+    """
+    
+    # 受影响源码包结果表的列，多条依赖链条用分号拼接成一个字符串
+    result_columns = ['package', 'category', 'arch', 'homepage', 'dependency_chain']
+    
+    def __init__(self, filepath: str, columns: Optional[List[str]] = None):
+        self.filepath = filepath
+        self.columns = list(columns) if columns is not None else self.result_columns
+    
+    def result_row(self, source_pkg: str, data: Dict[str, any]) -> Dict[str, any]:
+        """把一个受影响源码包的分析结果转换成结果表的一行"""
+        return {
+            'package': source_pkg,
+            'category': data['category'],
+            'arch': data['arch'],
+            'homepage': data['homepage'],
+            'dependency_chain': '; '.join(render_chains(data['chains'])),
+        }
+    
+    def write(self, source_pkg: str, data: Dict[str, any]):
+        self.write_row(self.result_row(source_pkg, data))
+    
+    @abstractmethod
+    def write_row(self, row: Dict[str, any]):
+        """写入一行，row以列名为键"""
+    
+    def close(self) -> Optional[str]:
+        return self.filepath
+    
+    def discard(self):
+        """放弃输出：关闭并删除已创建的文件（其他输出后端无法创建时使用）"""
+        self.close()
+        if self.filepath and os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+class CsvResultWriter(ResultWriter):
+    """流式CSV输出：每行一条记录，结果表中多条依赖链条用分号分隔"""
+    
+    def __init__(self, filepath: str, columns: Optional[List[str]] = None):
+        super().__init__(filepath, columns)
+        self._file = open(filepath, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+    
+    def write_row(self, row: Dict[str, any]):
+        self._writer.writerow([row[name] for name in self.columns])
+    
+    def close(self) -> Optional[str]:
+        self._file.close()
+        return self.filepath
+
+
+class JsonlResultWriter(ResultWriter):
+    """流式JSON Lines输出：每行一个JSON对象，结果表中的依赖链条为列表"""
+    
+    result_columns = ['package', 'category', 'arch', 'homepage', 'chains']
+    
+    def __init__(self, filepath: str, columns: Optional[List[str]] = None):
+        super().__init__(filepath, columns)
+        self._file = open(filepath, 'w', encoding='utf-8')
+    
+    def result_row(self, source_pkg: str, data: Dict[str, any]) -> Dict[str, any]:
+        return {
+            'package': source_pkg,
+            'category': data['category'],
+            'arch': data['arch'],
+            'homepage': data['homepage'],
+            'chains': render_chains(data['chains']),
+        }
+    
+    def write_row(self, row: Dict[str, any]):
+        record = {name: row[name] for name in self.columns}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    def close(self) -> Optional[str]:
+        self._file.close()
+        return self.filepath
+
+
+class ParquetResultWriter(ResultWriter):
+    """列式Parquet输出：按批写入row group，需要pyarrow"""
+    
+    batch_size = 10000
+    # 与JSON Lines相同，结果表中的依赖链条为列表
+    result_columns = JsonlResultWriter.result_columns
+    result_row = JsonlResultWriter.result_row
+    
+    def __init__(self, filepath: str, columns: Optional[List[str]] = None):
+        super().__init__(filepath, columns)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise RuntimeError("Parquet输出需要安装pyarrow") from e
+        
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        if columns is None:
+            self._schema = pyarrow.schema([
+                ('package', pyarrow.string()),
+                ('category', pyarrow.string()),
+                ('arch', pyarrow.string()),
+                ('homepage', pyarrow.string()),
+                ('chains', pyarrow.list_(pyarrow.string())),
+            ])
+            self._writer = pyarrow.parquet.ParquetWriter(filepath, self._schema)
+        else:
+            # 其他表格没有固定的列类型：收集全部行，close()时由pyarrow推断类型整表写入
+            self._schema = None
+            self._writer = None
+        self._columns = {name: [] for name in self.columns}
+    
+    def write_row(self, row: Dict[str, any]):
+        for name, values in self._columns.items():
+            values.append(row[name])
+        if self._writer is not None and len(values) >= self.batch_size:
+            self._flush()
+    
+    def _flush(self):
+        self._writer.write_table(self._pa.Table.from_pydict(self._columns, schema=self._schema))
+        self._columns = {name: [] for name in self.columns}
+    
+    def close(self) -> Optional[str]:
+        if self._writer is None:
+            self._pq.write_table(self._pa.Table.from_pydict(self._columns), self.filepath)
+            return self.filepath
+        if self._columns[self.columns[0]]:
+            self._flush()
+        self._writer.close()
+        return self.filepath
+
+
+class ExcelResultWriter(ResultWriter):
+    """Excel输出：需要整表写入，收集全部行后在close()时写入并设置表头样式和列宽"""
+    
+    # 结果表的中文表头；其他表格使用列名作为表头
+    result_headers = {'package': '包名', 'category': '分类', 'arch': '架构', 'homepage': '主页',
+                      'dependency_chain': '依赖链条'}
+    # 列宽，未列出的列使用default_width
+    column_widths = {'package': 25, 'source': 25, 'category': 20, 'arch': 15, 'homepage': 50,
+                     'dependency_chain': 80}
+    default_width = 15
+    
+    def __init__(self, filepath: str, columns: Optional[List[str]] = None, sheet_name: str = '依赖分析结果',
+                 stats: Optional['RunStats'] = None):
+        # 尽早发现缺少的依赖，避免分析完成后才失败；真正的导入推迟到close()
+        for module in ('pandas', 'openpyxl'):
+            if importlib.util.find_spec(module) is None:
+                raise RuntimeError(f"Excel输出需要安装{module}")
+        super().__init__(filepath, columns)
+        self._headers = self.result_headers if columns is None else {}
+        self._sheet_name = sheet_name
+        self._stats = stats if stats is not None else RunStats()
+        self._rows = []
+    
+    def discard(self):
+        self._rows = []
+    
+    def write_row(self, row: Dict[str, any]):
+        self._rows.append([row[name] for name in self.columns])
+    
+    def close(self) -> Optional[str]:
+        if not self._rows:
+            return None
+        with self._stats.phase("excel"):
+            # pandas/openpyxl导入较慢，只在导出Excel时加载
+            import pandas as pd
+            from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
+            
+            headers = [self._headers.get(name, name) for name in self.columns]
+            df = pd.DataFrame(self._rows, columns=headers)
+            with pd.ExcelWriter(self.filepath, engine='openpyxl') as writer:
+                df.to_excel(writer, sheet_name=self._sheet_name, index=False)
+                worksheet = writer.sheets[self._sheet_name]
+                
+                # 样式设置逐个单元格进行，大表时耗时明显，单独计时
+                with self._stats.phase("excel_style"):
+                    # 调整列宽
+                    for i, name in enumerate(self.columns, 1):
+                        worksheet.column_dimensions[get_column_letter(i)].width = \
+                            self.column_widths.get(name, self.default_width)
+                    
+                    # 设置表头样式
+                    header_font = Font(bold=True, color="FFFFFF")
+                    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+                    for cell in worksheet[1]:
+                        cell.font = header_font
+                        cell.fill = header_fill
+                        cell.alignment = Alignment(horizontal="center", vertical="center")
+                    
+                    # 设置数据行样式
+                    for row in worksheet.iter_rows(min_row=2, max_row=len(self._rows) + 1):
+                        for cell in row:
+                            cell.alignment = Alignment(vertical="top", wrap_text=True)
+        self._rows = []
+        return self.filepath
+
+
+# 结果导出格式 -> (输出后端, 文件扩展名)
+RESULT_WRITERS = {
+    'excel': (ExcelResultWriter, 'xlsx'),
+    'csv': (CsvResultWriter, 'csv'),
+    'jsonl': (JsonlResultWriter, 'jsonl'),
+    'parquet': (ParquetResultWriter, 'parquet'),
+}
 
 
 class PackageDependencyAnalyzer:
     def __init__(self):
         self.result_dir = "result"
         self.sources_file = os.path.join(self.result_dir, "Sources")
-        self.sources_url = "https://mirrors.ustc.edu.cn/debian/dists/trixie/main/source/Sources.xz"
-    
-    def init(self):
-        """删除并重建result目录，下载最新的debian-trixie的Source.xz"""
-        print("INFO: Initializing environment...")
-        
-        # 删除并重建result目录
-        if os.path.exists(self.result_dir):
-            shutil.rmtree(self.result_dir)
-        os.makedirs(self.result_dir)
-        
-        # 下载Sources.xz文件
-        sources_xz_path = os.path.join(self.result_dir, "Sources.xz")
-        print(f"INFO: Downloading {self.sources_url}...")
-        urllib.request.urlretrieve(self.sources_url, sources_xz_path)
-        
-        # 解压Sources.xz文件
-        print("INFO: Extracting Sources.xz...")
-        with lzma.open(sources_xz_path, 'rb') as f_in:
-            with open(self.sources_file, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        
-        # 删除压缩文件
-        os.remove(sources_xz_path)
-        print("INFO: Environment initialization completed.")
-    
-    def _parse_sources_file(self) -> Dict[str, Dict[str, str]]:
-        """解析Sources文件，返回包信息字典"""
+        # 发行版及组件：多个组件的Sources合并成一个Sources文件分析（组件之间也有构建依赖）
+        self.suite = "trixie"
+        self.components = ["main"]
+        self.sources_url = "https://mirrors.ustc.edu.cn/debian/dists/{suite}/{component}/source/Sources.xz"
+        # 解析后的源码包表：源码包名 -> SourcePackage，首次使用时加载
+        self._packages = None
+        # 二进制包名 -> 产生它的源码包名；被多个源码包声明的二进制包另记所有声明者
+        self._binary_to_source = None
+        self._binary_owners = None
+        # 反向构建依赖索引：二进制包名 -> 构建依赖它的源码包列表（按Sources文件顺序）
+        self._reverse_index = None
+        # 源码包依赖图：源码包名 -> 构建依赖其任一二进制包的源码包
+        self._source_graph = None
+        # (源码包表, 源码包名 -> 在Sources文件中的序号)，源码包表被替换时重建，见_package_positions
+        self._positions = (None, None)
+        # 依赖过滤：只考虑在该架构、启用这些构建配置时生效的依赖（None表示不过滤），见set_dependency_filter
+        self.arch = None
+        self.profiles = None
+        # 遍历选项：最大深度（None表示不限制）和每个受影响源码包记录的最短依赖链条数
+        self.max_depth = None
+        self.max_chains = 1
+        self.max_package_chains = None  # 每个受影响源码包最多保留的最短链条数（所有目标合计），None表示不限制
+        # 批量分析的工作进程数，大于1时把目标分块交给进程池并行遍历（链条仍由主进程构造），见_traverse_parallel
+        self.workers = 1
+        # 计算整个归档影响排名时每遍处理的源码包数（可达集合位图的位数），限制峰值内存
+        self.rank_block_size = 4096
+        # 影响排名模式在控制台打印的行数
+        self.rank_top = 20
+        # 下载新的Sources时把旧文件（及其快照）保留为Sources.prev，供diff_archive比较
+        self.keep_previous_sources = False
+        # 额外加载这些架构的Packages文件以解析Provides（虚包），为空时不加载
+        self.packages_archs = []
+        self.packages_url = "https://mirrors.ustc.edu.cn/debian/dists/{suite}/{component}/binary-{arch}/Packages.xz"
+        # 二进制包名 -> 它提供的虚包名；虚包名 -> 提供它的二进制包（合并所有架构），首次使用时加载
+        self._provided_names = None
+        self._provides = None
+        # 已计算的影响排名：参数 -> 排名，见impact_ranking
+        self._rankings = {}
+        # 各阶段耗时和计数器，见RunStats
+        self.stats = RunStats()
+    
+    def _clone_config(self, sources_file: Optional[str] = None) -> 'PackageDependencyAnalyzer':
+        """创建配置相同（下载地址、过滤条件、遍历选项等）但尚未加载数据的分析器"""
+        analyzer = PackageDependencyAnalyzer()
+        for attr in ('result_dir', 'sources_file', 'suite', 'components', 'sources_url', 'packages_url', 'packages_archs',
+                     'max_depth', 'max_chains', 'max_package_chains', 'rank_block_size', 'rank_top',
+                     'keep_previous_sources'):
+            setattr(analyzer, attr, getattr(self, attr))
+        if sources_file is not None:
+            analyzer.sources_file = sources_file
+        # 同一次运行中的所有分析器（diff的旧归档、查询服务重新加载的归档）计入同一份统计
+        analyzer.stats = self.stats
+        if self._dependency_filter_active():
+            analyzer.set_dependency_filter(self.arch, None if self.profiles is None else list(self.profiles))
+        return analyzer
+    
+    def init(self, force: bool = False) -> bool:
+        """准备result目录并增量更新suite各组件的Sources文件（以及packages_archs中各架构的Packages文件）
+        
+        镜像上的Sources.xz未变化（按ETag/Last-Modified判断）时跳过下载；
+        有多个组件时逐个组件增量下载，再合并成一个Sources文件；
+        result目录中之前生成的报告会被保留。
+        
+        Args:
+            force: 忽略已有的Sources文件，强制重新下载
+            
+        Returns:
+            bool: 是否有文件被更新
+        """
+        logger.info("Initializing environment...")
+        
+        os.makedirs(self.result_dir, exist_ok=True)
+        
+        archive = f"{self.suite}/{','.join(self.components)}"
+        updated = self._refresh_sources(force)
+        if not updated:
+            logger.info("%s Sources.xz 未变化，跳过下载", archive)
+        
+        for arch in self.packages_archs:
+            if self._refresh_packages(arch, force):
+                updated = True
+            else:
+                logger.info("%s binary-%s/Packages.xz 未变化，跳过下载", archive, arch)
+        
+        logger.info("Environment initialization completed.")
+        return updated
+    
+    def _read_download_meta(self, urls: List[str], path: str) -> Dict[str, str]:
+        """读取上次写入path时记录的元数据（各组件的下载地址和HTTP缓存头），只有文件存在且下载地址列表相同时才有效；
+        地址列表不同（例如组件从 main,contrib 改为 main）说明path是由其他组件合并而成的，必须重建"""
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path + ".meta", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return meta if meta.get('urls') == urls else {}
+    
+    def _conditional_download(self, url: str, path: str, stream, force: bool = False) -> bool:
+        """按条件请求下载url，由stream(response)解压写入path；返回path是否被更新"""
+        meta = {} if force else self._read_download_meta([url], path)
+        
+        request = urllib.request.Request(url)
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+        
+        try:
+            with self.stats.phase("download"):
+                response = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:  # Not Modified
+                self.stats.count("download_not_modified")
+                return False
+            raise
+        
+        with response:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            
+            # file:// 或忽略条件请求的服务器仍会返回完整内容，此时比较响应头
+            if meta and ((etag and etag == meta.get('etag')) or
+                         (not etag and last_modified and last_modified == meta.get('last_modified'))):
+                self.stats.count("download_not_modified")
+                return False
+            
+            logger.info("Downloading and extracting %s...", url)
+            stream(response)
+        self.stats.count("downloads")
+        
+        with open(path + ".meta", 'w', encoding='utf-8') as f:
+            json.dump({'urls': [url], 'etag': etag, 'last_modified': last_modified}, f)
+        return True
+    
+    def _refresh_sources(self, force: bool = False) -> bool:
+        """按条件请求下载各组件的Sources.xz，返回Sources文件是否被更新"""
+        urls = [self.sources_url.format(suite=self.suite, component=component) for component in self.components]
+        if len(urls) == 1:
+            return self._conditional_download(urls[0], self.sources_file, self._stream_sources, force)
+        return self._download_components(urls, self.sources_file, self._install_combined_sources, force)
+    
+    def _install_combined_sources(self, tmp_path: str):
+        """用合并好的多组件Sources替换Sources文件，并丢弃基于旧文件的缓存"""
+        self._invalidate_caches()
+        self._install_sources(tmp_path)
+    
+    def _download_components(self, urls: List[str], path: str, install, force: bool = False) -> bool:
+        """有多个组件时，每个组件单独按条件请求下载并解压到 path_<组件>；
+        有组件更新、path还不存在或不是由这些组件合并而成时，把所有组件依次拼接到path.tmp，
+        由install(path.tmp)替换path，并在path.meta中记录组件的下载地址列表。返回path是否被更新
+        
+        合并后的文件在首次使用时解析并写入快照，不像单个组件时那样边下载边解析。
+        """
+        updated = False
+        parts = []
+        for component, url in zip(self.components, urls):
+            part = f"{path}_{component}"
+            parts.append(part)
+            if self._conditional_download(url, part, lambda response, part=part: self._stream_to_file(response, part),
+                                          force):
+                updated = True
+        if not updated and self._read_download_meta(urls, path):
+            return False
+        
+        tmp_path = path + ".tmp"
+        try:
+            with self.stats.phase("combine"), open(tmp_path, 'wb') as sink:
+                for part in parts:
+                    with open(part, 'rb') as f:
+                        shutil.copyfileobj(f, sink, 1 << 20)
+                    # 保证最后一个段落以空行结束，不与下一个组件的第一个段落连在一起
+                    sink.write(b"\n")
+            install(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        with open(path + ".meta", 'w', encoding='utf-8') as f:
+            json.dump({'urls': urls}, f)
+        return True
+    
+    def _stream_to_file(self, response, path: str):
+        """边下载边把.xz解压写入path，不解析（多组件时的单个组件）"""
+        tmp_path = path + ".tmp"
+        try:
+            with self.stats.phase("download"), open(tmp_path, 'wb') as sink, lzma.open(response) as xz:
+                shutil.copyfileobj(xz, sink, 1 << 20)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _install_sources(self, tmp_path: str):
+        """用下载好的tmp_path替换Sources文件；keep_previous_sources时把旧文件（及其快照和排名缓存）保留为Sources.prev"""
+        if self.keep_previous_sources and os.path.exists(self.sources_file):
+            # 快照文件头记录的大小和mtime在重命名后不变，旧快照仍然有效
+            previous = self._previous_sources_path()
+            for suffix in ('', '.cache', '.ranking'):
+                if os.path.exists(self.sources_file + suffix):
+                    os.replace(self.sources_file + suffix, previous + suffix)
+        os.replace(tmp_path, self.sources_file)
+    
+    def _stream_sources(self, response):
+        """边下载边解压Sources.xz：解压出的数据同时写入Sources文件并直接送入解析器，
+        不落盘中间的.xz文件；完成后重建索引并写入预解析快照"""
+        tmp_path = self.sources_file + ".tmp"
+        digest = hashlib.sha256()
+        
+        self._invalidate_caches()
+        try:
+            with open(tmp_path, 'wb') as sink, lzma.open(response) as xz:
+                reader = io.BufferedReader(_TeeReader(xz, sink, digest, self.stats), buffer_size=1 << 20)
+                with io.TextIOWrapper(reader, encoding='utf-8') as text, self.stats.phase("parse"):
+                    packages, binary_to_source, binary_owners = self._parse_sources_lines(text)
+            self._install_sources(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        self._packages = packages
+        self._binary_to_source = binary_to_source
+        self._binary_owners = binary_owners
+        self._build_reverse_index()
+        self._write_snapshot(digest.digest())
+    
+    def _previous_sources_path(self) -> str:
+        """keep_previous_sources时保留的上一版Sources文件"""
+        return self.sources_file + ".prev"
+    
+    def _packages_file(self, arch: str) -> str:
+        """架构arch的Packages文件，与Sources文件放在同一目录"""
+        return os.path.join(os.path.dirname(self.sources_file), f"Packages_{arch}")
+    
+    def _refresh_packages(self, arch: str, force: bool = False) -> bool:
+        """按条件请求下载架构arch各组件的Packages.xz，返回Packages文件是否被更新"""
+        path = self._packages_file(arch)
+        urls = [self.packages_url.format(suite=self.suite, component=component, arch=arch)
+                for component in self.components]
+        if len(urls) == 1:
+            return self._conditional_download(urls[0], path, lambda response: self._stream_packages(response, path),
+                                              force)
+        return self._download_components(urls, path, lambda tmp_path: self._install_packages(tmp_path, path), force)
+    
+    def _install_packages(self, tmp_path: str, path: str):
+        """用合并好的多组件Packages替换path，并丢弃基于旧文件的Provides索引"""
+        self._invalidate_provides()
+        os.replace(tmp_path, path)
+    
+    def _stream_packages(self, response, path: str):
+        """边下载边解压Packages.xz，同一遍中提取Provides并写入该文件的快照"""
+        tmp_path = path + ".tmp"
+        digest = hashlib.sha256()
+        
+        self._invalidate_provides()
+        try:
+            with open(tmp_path, 'wb') as sink, lzma.open(response) as xz:
+                reader = io.BufferedReader(_TeeReader(xz, sink, digest, self.stats), buffer_size=1 << 20)
+                with io.TextIOWrapper(reader, encoding='utf-8') as text, self.stats.phase("provides"):
+                    provided = self._parse_packages_lines(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        self._dump_snapshot(path + ".cache", path, provided, digest.digest())
+    
+    def _invalidate_provides(self):
+        """丢弃基于旧Packages文件的Provides索引及依赖于它的依赖图和影响排名"""
+        self._provided_names = None
+        self._provides = None
+        self._source_graph = None
+        self._rankings = {}
+    
+    def _invalidate_caches(self):
+        """丢弃基于旧Sources文件的解析结果和索引"""
+        self._packages = None
+        self._binary_to_source = None
+        self._binary_owners = None
+        self._reverse_index = None
+        self._source_graph = None
+        self._rankings = {}
+    
+    def _parse_sources_file(self) -> Tuple[Dict[str, SourcePackage], Dict[str, str], Dict[str, Tuple[str, ...]]]:
+        """解析Sources文件，返回值见_parse_sources_lines"""
+        with open(self.sources_file, 'r', encoding='utf-8') as f, self.stats.phase("parse"):
+            return self._parse_sources_lines(f)
+    
+    def _parse_sources_lines(self, lines) -> Tuple[Dict[str, SourcePackage], Dict[str, str], Dict[str, Tuple[str, ...]]]:
+        """逐行解析Sources内容，lines可以是文件对象或解压流
+        
+        在同一遍解析中建立二进制包到源码包的映射。
+        
+        Returns:
+            Tuple[packages, binary_to_source, binary_owners]:
+                源码包名 -> SourcePackage（只保留SOURCE_FIELDS中的字段）；
+                二进制包名 -> 源码包名（多个源码包声明同一二进制包时取Sources中第一个）；
+                被多个源码包声明的二进制包名 -> 所有声明它的源码包
+        """
         packages = {}
-        current_package = {}
-        current_package_name = None
+        binary_to_source = {}
+        binary_owners = {}
+        fields = {}
+        current_field = None
+        field_map = SOURCE_FIELDS
+        make_package = self._make_source_package
         
-        with open(self.sources_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                
-                if not line:  # 空行，表示一个包的结束
-                    if current_package_name and current_package:
-                        packages[current_package_name] = current_package.copy()
-                    current_package = {}
-                    current_package_name = None
-                    continue
-                
-                if line.startswith(' '):  # 继续字段
-                    if 'current_field' in locals():
-                        current_package[current_field] += ' ' + line.strip()
-                    continue
-                
-                if ':' in line:
-                    field, value = line.split(':', 1)
-                    field = field.strip()
-                    value = value.strip()
-                    current_field = field
-                    current_package[field] = value
-                    
-                    if field == 'Package':
-                        current_package_name = value
+        # 末尾补一个空行，让最后一个包和其他包走同样的结束处理
+        for line in itertools.chain(lines, ('\n',)):
+            if line[0] in ' \t':  # 继续字段
+                if current_field is not None:
+                    fields[current_field] += ' ' + line.strip()
+                continue
+            
+            if line.isspace():  # 空行，表示一个包的结束
+                if 'name' in fields:
+                    pkg = make_package(fields)
+                    name = pkg.name
+                    packages[name] = pkg
+                    for binary in pkg.binaries:
+                        owner = binary_to_source.setdefault(binary, name)
+                        if owner != name:
+                            owners = binary_owners.setdefault(binary, (owner,))
+                            if name not in owners:
+                                binary_owners[binary] = owners + (name,)
+                fields = {}
+                current_field = None
+                continue
+            
+            field, sep, value = line.partition(':')
+            current_field = field_map.get(field)
+            if current_field is not None:
+                fields[current_field] = value.strip()
+        
+        self.stats.count("packages_parsed", len(packages))
+        return packages, binary_to_source, binary_owners
+    
+    @staticmethod
+    def _make_source_package(fields: Dict[str, str]) -> SourcePackage:
+        """由解析出的字段构造SourcePackage，包名统一intern以共享字符串"""
+        binaries = fields.pop('binaries', '')
+        binaries = tuple(sys.intern(pkg) for pkg in binaries.replace(' ', '').split(',') if pkg) if binaries else ()
+        return SourcePackage(name=sys.intern(fields.pop('name')), binaries=binaries, **fields)
+    
+    def _get_packages(self) -> Dict[str, SourcePackage]:
+        """返回解析后的源码包表，首次调用时加载"""
+        if self._packages is None:
+            self._load_archive()
+        return self._packages
+    
+    def _load_archive(self):
+        """加载源码包表及索引：优先使用有效的预解析快照，否则解析Sources文件并重写快照"""
+        if self._load_snapshot():
+            # 快照只保存未过滤的反向索引，设置了过滤条件时需要重建
+            if self._reverse_index is None:
+                self._build_reverse_index()
+            return
+        
+        self._packages, self._binary_to_source, self._binary_owners = self._parse_sources_file()
+        self._build_reverse_index()
+        self._write_snapshot()
+    
+    def _snapshot_path(self) -> str:
+        """预解析快照与Sources文件放在同一目录"""
+        return self.sources_file + ".cache"
+    
+    @staticmethod
+    def _file_digest(path: str) -> bytes:
+        """计算文件的sha256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.digest()
+    
+    def _dump_snapshot(self, snapshot_path: str, data_path: str, payload, digest: Optional[bytes] = None):
+        """把payload用marshal写入snapshot_path，文件头记录data_path的大小、mtime和sha256（digest为已知的sha256）"""
+        stat = os.stat(data_path)
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.hexversion >> 16,
+                                      stat.st_size, stat.st_mtime_ns, digest or self._file_digest(data_path))
+        
+        tmp_path = snapshot_path + ".tmp"
+        try:
+            with self.stats.phase("snapshot_write"):
+                data = marshal.dumps(payload)
+                with open(tmp_path, 'wb') as f:
+                    f.write(header)
+                    f.write(data)
+                os.replace(tmp_path, snapshot_path)
+        except OSError as e:
+            logger.warning("无法写入预解析快照 %s: %s", snapshot_path, e)
+    
+    def _read_snapshot(self, snapshot_path: str, data_path: str):
+        """读取与data_path当前内容匹配的快照payload，快照不存在或已过期时返回None"""
+        if not os.path.exists(snapshot_path):
+            return None
+        
+        stat = os.stat(data_path)
+        with open(snapshot_path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # 空文件
+                return None
+        
+        with mm:
+            if len(mm) < SNAPSHOT_HEADER.size:
+                return None
+            magic, version, pyversion, size, mtime_ns, digest = SNAPSHOT_HEADER.unpack_from(mm)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or pyversion != sys.hexversion >> 16:
+                return None
+            if size != stat.st_size:
+                return None
+            # mtime变化但内容未变（例如重新解压出相同文件）时，用sha256确认
+            touched = mtime_ns != stat.st_mtime_ns
+            if touched and digest != self._file_digest(data_path):
+                return None
+            
+            with _gc_paused():
+                try:
+                    with memoryview(mm) as view:
+                        payload = marshal.loads(view[SNAPSHOT_HEADER.size:])
+                except (EOFError, ValueError, TypeError):
+                    return None
         
-        # 处理最后一个包
-        if current_package_name and current_package:
-            packages[current_package_name] = current_package.copy()
+        if touched:
+            # 记录新的mtime，避免之后每次启动都重新计算sha256
+            try:
+                with open(snapshot_path, 'r+b') as f:
+                    f.write(SNAPSHOT_HEADER.pack(magic, version, pyversion, size, stat.st_mtime_ns, digest))
+            except OSError:
+                pass
+        return payload
+    
+    def _write_snapshot(self, digest: Optional[bytes] = None):
+        """将源码包表、二进制包映射和反向索引写入预解析快照；digest为已知的Sources sha256"""
+        package_table = tuple(
+            (pkg.name, pkg.binaries, pkg.build_depends, pkg.build_depends_indep,
+             pkg.architecture, pkg.section, pkg.homepage)
+            for pkg in self._packages.values()
+        )
+        # 快照只保存未过滤的反向索引
+        reverse_index = None if self._dependency_filter_active() else self._reverse_index
+        self._dump_snapshot(self._snapshot_path(), self.sources_file,
+                            (package_table, self._binary_to_source, self._binary_owners, reverse_index), digest)
+    
+    def _snapshot_current(self) -> bool:
+        """预解析快照的文件头是否与当前Sources文件的大小和mtime一致；只读文件头，不加载快照也不计算sha256"""
+        try:
+            stat = os.stat(self.sources_file)
+            with open(self._snapshot_path(), 'rb') as f:
+                header = f.read(SNAPSHOT_HEADER.size)
+        except OSError:
+            return False
+        if len(header) < SNAPSHOT_HEADER.size:
+            return False
+        magic, version, pyversion, size, mtime_ns, _ = SNAPSHOT_HEADER.unpack(header)
+        return (magic == SNAPSHOT_MAGIC and version == SNAPSHOT_VERSION and pyversion == sys.hexversion >> 16 and
+                size == stat.st_size and mtime_ns == stat.st_mtime_ns)
+    
+    def _load_snapshot(self) -> bool:
+        """加载与当前Sources文件匹配的预解析快照，快照不存在或已过期时返回False"""
+        with self.stats.phase("snapshot_load"):
+            payload = self._read_snapshot(self._snapshot_path(), self.sources_file)
+            if payload is None:
+                self.stats.count("snapshot_misses")
+                return False
+            
+            try:
+                package_table, binary_to_source, binary_owners, reverse_index = payload
+                with _gc_paused():
+                    packages = {row[0]: SourcePackage(*row) for row in package_table}
+            except (ValueError, TypeError):
+                self.stats.count("snapshot_misses")
+                return False
         
-        return packages
+        self.stats.count("snapshot_hits")
+        self._packages = packages
+        self._binary_to_source = binary_to_source
+        self._binary_owners = binary_owners
+        # 设置了依赖过滤时，反向索引在首次使用时按过滤条件重建
+        self._reverse_index = None if self._dependency_filter_active() else reverse_index
+        return True
     
-    def _parse_dependencies(self, dep_string: str) -> List[str]:
-        """解析依赖字符串，返回包名列表"""
+    @staticmethod
+    def _parse_packages_lines(lines) -> Dict[str, Tuple[str, ...]]:
+        """逐行解析Packages内容，只提取Provides，返回 二进制包名 -> 它提供的虚包名
+        
+        Packages文件比Sources大得多（主要是Description），只看 Package: 和 Provides: 两种行。
+        """
+        provided = {}
+        name = None
+        for line in lines:
+            if line[0] != 'P':
+                continue
+            if line.startswith('Package:'):
+                name = sys.intern(line[8:].strip())
+            elif line.startswith('Provides:') and name is not None:
+                # 例如 Provides: mail-transport-agent, libfoo-abi-2 (= 2.1)
+                names = tuple(sys.intern(virtual) for virtual in _RELATION_NAME_RE.findall(line[9:]))
+                previous = provided.get(name)
+                provided[name] = names if previous is None else tuple(dict.fromkeys(previous + names))
+        return provided
+    
+    def _load_packages_index(self, arch: str) -> Dict[str, Tuple[str, ...]]:
+        """加载架构arch的Provides：优先使用快照，否则解析Packages文件并写入快照"""
+        path = self._packages_file(arch)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Packages文件不存在: {path}")
+        
+        provided = self._read_snapshot(path + ".cache", path)
+        if provided is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                provided = self._parse_packages_lines(f)
+            self._dump_snapshot(path + ".cache", path, provided)
+        return provided
+    
+    def _get_provided_names(self) -> Dict[str, Tuple[str, ...]]:
+        """返回合并所有packages_archs后的 二进制包名 -> 提供的虚包名，首次调用时加载"""
+        if self._provided_names is None:
+            start = time.perf_counter()
+            with self.stats.phase("provides"):
+                provided = {}
+                for arch in self.packages_archs:
+                    for binary, names in self._load_packages_index(arch).items():
+                        previous = provided.get(binary)
+                        provided[binary] = names if previous is None else tuple(dict.fromkeys(previous + names))
+                
+                provides = defaultdict(list)
+                for binary, names in provided.items():
+                    for virtual in names:
+                        provides[virtual].append(binary)
+            
+            self._provided_names = provided
+            self._provides = dict(provides)
+            if self.packages_archs:
+                # 虚包名和二进制包名已intern，只统计容器本身
+                size = sys.getsizeof(provided) + sys.getsizeof(self._provides) + \
+                    sum(sys.getsizeof(names) for names in provided.values()) + \
+                    sum(sys.getsizeof(binaries) for binaries in self._provides.values())
+                logger.info("Provides索引（%s）: %d 个二进制包提供 %d 个虚包，约 %.1f MB，加载耗时 %.3fs",
+                            ', '.join(self.packages_archs), len(provided), len(self._provides),
+                            size / 1024 / 1024, time.perf_counter() - start)
+        return self._provided_names
+    
+    def get_provides(self, virtual_package: str) -> List[str]:
+        """返回提供虚包virtual_package的所有二进制包（需设置packages_archs）"""
+        self._get_provided_names()
+        return list(self._provides.get(virtual_package, ()))
+    
+    def _dependency_providers(self, name: str) -> set:
+        """产生name（二进制包或虚包）的源码包"""
+        providers = set(self.get_binary_owners(name))
+        self._get_provided_names()
+        for binary in self._provides.get(name, ()):
+            providers.update(self.get_binary_owners(binary))
+        return providers
+    
+    def _dependency_names(self, binary_package: str) -> Tuple[str, ...]:
+        """源码包构建依赖binary_package时可能使用的名字：包名本身及它提供的虚包名"""
+        return (binary_package,) + self._get_provided_names().get(binary_package, ())
+    
+    def set_dependency_filter(self, arch: Optional[str] = None, profiles: Optional[List[str]] = None):
+        """设置依赖过滤条件，之后的分析只考虑在该架构、启用这些构建配置时生效的依赖
+        
+        Args:
+            arch: 目标架构，例如 amd64；None表示不按架构过滤
+            profiles: 启用的构建配置，例如 ["nocheck"]；空列表表示不启用任何配置，None表示不按配置过滤
+        """
+        self.arch = arch
+        self.profiles = frozenset(profiles) if profiles is not None else None
+        # 反向索引、依赖图和影响排名依赖于过滤条件，需要重建
+        self._reverse_index = None
+        self._source_graph = None
+        self._rankings = {}
+    
+    def _dependency_filter_active(self) -> bool:
+        return self.arch is not None or self.profiles is not None
+    
+    def _parse_dependencies(self, dep_string: str) -> Tuple[str, ...]:
+        """解析依赖字符串，返回在当前过滤条件下生效的包名（包含 | 分隔的所有可选依赖）"""
         if not dep_string:
+            return ()
+        
+        if not self._dependency_filter_active():
+            return relation_names(dep_string)
+        return filtered_relation_names(dep_string, self.arch, self.profiles)
+    
+    def _source_applies(self, pkg: SourcePackage) -> bool:
+        """源码包是否会在当前架构上构建（未设置架构或Architecture字段匹配）"""
+        if self.arch is None:
+            return True
+        return architecture_applies(pkg.architecture, self.arch)
+    
+    def _build_reverse_index(self):
+        """一遍扫描所有源码包，建立 二进制包名 -> 构建依赖它的源码包 的反向索引"""
+        reverse_index = defaultdict(list)
+        
+        # 解析结果缓存和索引只含不构成循环引用的元组和列表，期间暂停GC
+        with self.stats.phase("index"), _gc_paused():
+            for pkg_name, pkg in self._get_packages().items():
+                for dep in self._package_dependencies(pkg):
+                    reverse_index[dep].append(pkg_name)
+        
+        self._reverse_index = dict(reverse_index)
+    
+    def _package_dependencies(self, pkg: SourcePackage) -> List[str]:
+        """源码包在当前过滤条件下的构建依赖名（Build-Depends和Build-Depends-Indep），按出现顺序去重"""
+        if not self._source_applies(pkg):
             return []
         
-        # 移除版本约束和选择性依赖
-        dep_string = re.sub(r'\([^)]*\)', '', dep_string)  # 移除版本约束
-        dep_string = re.sub(r'\[[^\]]*\]', '', dep_string)  # 移除架构约束
+        all_deps = self._parse_dependencies(pkg.build_depends) + self._parse_dependencies(pkg.build_depends_indep)
         
-        # 分割依赖项
-        deps = []
-        for dep in dep_string.split(','):
-            # 处理OR依赖（|分隔），只取第一个
-            dep = dep.split('|')[0].strip()
-            if dep and not dep.startswith('$'):  # 排除变量
-                deps.append(dep)
+        # 同一个依赖可能在两个字段中重复出现，每个源码包只记录一次
+        return list(dict.fromkeys(all_deps))
+    
+    def _get_reverse_index(self) -> Dict[str, List[str]]:
+        """返回反向构建依赖索引，首次调用时构建"""
+        if self._reverse_index is None:
+            if self._packages is None:
+                self._load_archive()
+            else:
+                self._build_reverse_index()
+        return self._reverse_index
+    
+    def _source_record(self, pkg_name: str) -> List[str]:
+        """返回源码包的 [包名, 分类, 架构, 主页] 记录"""
+        pkg = self._get_packages()[pkg_name]
+        section = pkg.section if pkg.section is not None else 'unknown'
+        return [pkg_name, section, pkg.architecture or '', pkg.homepage or '']
+    
+    def _get_source_graph(self) -> Dict[str, Tuple[str, ...]]:
+        """返回源码包依赖图，首次调用时由反向索引构建
         
-        return deps
+        边 S -> T 表示源码包T构建依赖于S产生的某个二进制包（或该二进制包提供的虚包）。
+        """
+        if self._source_graph is None:
+            reverse_index = self._get_reverse_index()
+            dependency_names = self._dependency_names
+            graph = {}
+            with self.stats.phase("graph"):
+                for pkg_name, pkg in self._get_packages().items():
+                    dependents = {}
+                    for binary in pkg.binaries:
+                        for name in dependency_names(binary):
+                            for dependent in reverse_index.get(name, ()):
+                                dependents[dependent] = None
+                    if dependents:
+                        graph[pkg_name] = tuple(dependents)
+            self._source_graph = graph
+        return self._source_graph
+    
+    def _package_positions(self) -> Dict[str, int]:
+        """返回 源码包名 -> 在Sources文件中的序号，用于让结果与字典的插入顺序无关"""
+        packages = self._get_packages()
+        if self._positions[0] is not packages:
+            self._positions = (packages, {name: i for i, name in enumerate(packages)})
+        return self._positions[1]
     
     def analysis(self, target: str, no_all: str = "yes") -> Dict[str, List[str]]:
         """分析依赖于指定target的软件包"""
-        print(f"INFO: 分析依赖于 '{target}' 的软件包...")
+        # 批量分析时每个目标都会调用，只在DEBUG级别输出
+        logger.debug("分析依赖于 '%s' 的软件包...", target)
         
         if no_all.lower() == "yes":
-            print("INFO: 过滤纯all架构的软件包")
+            logger.debug("过滤纯all架构的软件包")
         
-        packages = self._parse_sources_file()
+        self.stats.count("analysis_calls")
+        reverse_index = self._get_reverse_index()
+        packages = self._get_packages()
         result_dict = {}
         
-        for pkg_name, pkg_info in packages.items():
-            # 检查Build-Depends字段
-            build_depends = pkg_info.get('Build-Depends', '')
-            build_depends_indep = pkg_info.get('Build-Depends-Indep', '')
-            
-            all_deps = self._parse_dependencies(build_depends) + self._parse_dependencies(build_depends_indep)
-            
-            if target in all_deps:
+        # 构建依赖目标本身或目标提供的虚包的源码包
+        for name in self._dependency_names(target):
+            for pkg_name in reverse_index.get(name, ()):
                 # 过滤纯all包
-                architecture = pkg_info.get('Architecture', '')
-                if no_all.lower() == "yes" and architecture == 'all':
+                if pkg_name in result_dict or no_all.lower() == "yes" and packages[pkg_name].architecture == 'all':
                     continue
                 
-                # 提取包信息
-                name = pkg_name
-                section = pkg_info.get('Section', 'unknown')
-                archs = architecture
-                homepage = pkg_info.get('Homepage', '')
-                
-                result_dict[pkg_name] = [name, section, archs, homepage]
+                result_dict[pkg_name] = self._source_record(pkg_name)
         
-        print(f"INFO: 有{len(result_dict)}个软件包依赖于{target}")
+        logger.debug("有%d个软件包依赖于%s", len(result_dict), target)
         return result_dict
     
     def package_info(self, package_name: str) -> Dict[str, str]:
         """根据包名返回包的详细信息"""
-        packages = self._parse_sources_file()
+        packages = self._get_packages()
         
         if package_name not in packages:
             return {
@@ -149,238 +1527,874 @@ class PackageDependencyAnalyzer:
                 'homepage': ''
             }
         
-        pkg_info = packages[package_name]
+        pkg = packages[package_name]
         return {
-            'category': pkg_info.get('Section', 'unknown'),
-            'arch': pkg_info.get('Architecture', 'unknown'),
-            'homepage': pkg_info.get('Homepage', '')
+            'category': pkg.section if pkg.section is not None else 'unknown',
+            'arch': pkg.architecture if pkg.architecture is not None else 'unknown',
+            'homepage': pkg.homepage or ''
         }
     
     def get_binary_packages(self, source_package_name: str) -> List[str]:
         """获取源码包产生的所有二进制包名"""
-        packages = self._parse_sources_file()
+        pkg = self._get_packages().get(source_package_name)
+        
+        if pkg is None:
+            return []
+        
+        return list(pkg.binaries)
+    
+    def _output_path(self, target_list: List[str], extension: str, prefix: str = "dependency_analysis") -> str:
+        """生成带目标包名和时间戳的输出文件路径"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        target_names = "_".join(target_list[:3])  # 最多取前3个目标包名
+        if len(target_list) > 3:
+            target_names += f"_and_{len(target_list)-3}_more"
+        filename = f"{prefix}_{target_names}_{timestamp}.{extension}"
+        os.makedirs(self.result_dir, exist_ok=True)
+        return os.path.join(self.result_dir, filename)
+    
+    def _open_writer(self, output_format: str, target_list: List[str], columns: Optional[List[str]] = None,
+                     prefix: str = "dependency_analysis", sheet_name: str = '依赖分析结果') -> ResultWriter:
+        """创建指定格式的输出后端；columns不指定时输出受影响源码包的结果表"""
+        if output_format not in RESULT_WRITERS:
+            raise ValueError(f"未知的输出格式: {output_format}")
+        writer_class, extension = RESULT_WRITERS[output_format]
+        filepath = self._output_path(target_list, extension, prefix=prefix)
+        if writer_class is ExcelResultWriter:
+            return ExcelResultWriter(filepath, columns, sheet_name, self.stats)
+        return writer_class(filepath, columns)
+    
+    def export_to_excel(self, comprehensive_result: Dict[str, Dict[str, str]], target_list: List[str]) -> str:
+        """将comprehensive_result导出到Excel文件"""
+        writer = self._open_writer('excel', target_list)
+        for pkg_name, info in comprehensive_result.items():
+            writer.write_row({'package': pkg_name, **info})
+        return writer.close()
+    
+    @staticmethod
+    def _strip_arch_qualifier(binary_package: str) -> str:
+        """去掉依赖中的架构限定符，例如 python3:any、perl:native"""
+        return binary_package.partition(':')[0]
+    
+    def get_source_package_from_binary(self, binary_package: str) -> str:
+        """根据二进制包名找到对应的源码包名"""
+        return self.resolve_binaries([binary_package])[binary_package]
+    
+    def resolve_binaries(self, binary_packages: List[str]) -> Dict[str, str]:
+        """批量查找二进制包对应的源码包名
+        
+        多个源码包声明同一二进制包时取Sources中第一个（所有声明者见get_binary_owners）；
+        带架构限定符的名字（如 python3:any）按去掉限定符后的包名查找；
+        找不到时假设源码包名和二进制包名相同。
+        
+        Returns:
+            Dict: 二进制包名 -> 源码包名
+        """
+        self._get_packages()
+        binary_to_source = self._binary_to_source
+        
+        result = {}
+        for binary_package in binary_packages:
+            name = self._strip_arch_qualifier(binary_package)
+            result[binary_package] = binary_to_source.get(name, name)
+        return result
+    
+    def get_binary_owners(self, binary_package: str) -> List[str]:
+        """返回声明了该二进制包的所有源码包（按Sources文件顺序）"""
+        self._get_packages()
+        name = self._strip_arch_qualifier(binary_package)
+        if name in self._binary_owners:
+            return list(self._binary_owners[name])
+        if name in self._binary_to_source:
+            return [self._binary_to_source[name]]
+        return []
+    
+    def _traverse_sources(self, seed_lists: List[List[str]], no_all: str, max_depth: Optional[int] = None,
+                          max_chains: int = 1, origins: Optional[Dict[str, tuple]] = None
+                          ) -> Tuple[Dict[str, int], Dict[str, Dict[int, List[str]]]]:
+        """从多组起始源码包出发，在源码包依赖图上做一次分层的广度优先遍历
+        
+        每组起始源码包对应一个目标，用整数的一个比特位标记；源码包的掩码记录了哪些目标能到达它。
+        每层只向下传播新增的比特位，因此每个(源码包, 目标)最多展开一次，
+        多个目标共享同一次遍历，运行时间与图的规模成线性关系。
+        每个(源码包, 目标)记录上一层的父节点（最多max_chains个），用于还原最短依赖链条。
+        每层按Sources文件顺序展开，父节点总是同一层中排在Sources最前面的几个源码包：
+        每个比特位的逐层传播与其他目标无关，因此记录的父节点（和链条）不受同时遍历了哪些目标影响，
+        并行分析时按块拆分目标也得到与单进程相同的结果。
+        
+        Args:
+            seed_lists: 每个目标的起始源码包（第0层）
+            no_all: 是否过滤all架构包
+            max_depth: 最大层数，None表示不限制
+            max_chains: 每个(源码包, 目标)最多记录的父节点数
+            origins: 不为None时记录每个源码包首次到达的位置：起始源码包为 (0, 目标序号, 在起始列表中的序号)，
+                     其他为 (层数, 首次到达它的父节点)，见_order_keys
+            
+        Returns:
+            Tuple[masks, parents]: (源码包 -> 目标掩码, 源码包 -> {目标序号: 父节点列表})
+        """
+        graph = self._get_source_graph()
+        packages = self._get_packages()
+        position = self._package_positions().__getitem__
+        skip_all = no_all.lower() == "yes"
+        
+        with self.stats.phase("traverse"):
+            masks = {}
+            parents = {}
+            frontier = {}
+            visited = scanned = 0
+            for index, seeds in enumerate(seed_lists):
+                bit = 1 << index
+                for i, seed in enumerate(seeds):
+                    if origins is not None and seed not in masks:
+                        origins[seed] = (0, index, i)
+                    if not masks.get(seed, 0) & bit:
+                        masks[seed] = masks.get(seed, 0) | bit
+                        parents.setdefault(seed, {})[index] = []
+                        frontier[seed] = frontier.get(seed, 0) | bit
+            
+            depth = 0
+            while frontier and (max_depth is None or depth < max_depth):
+                next_frontier = {}
+                visited += len(frontier)
+                for node in sorted(frontier, key=position):
+                    bits = frontier[node]
+                    dependents = graph.get(node, ())
+                    scanned += len(dependents)
+                    for dependent in dependents:
+                        dependent_mask = masks.get(dependent)
+                        if dependent_mask is None:
+                            # 过滤纯all包
+                            if skip_all and packages[dependent].architecture == 'all':
+                                continue
+                            dependent_mask = 0
+                            if origins is not None:
+                                origins[dependent] = (depth + 1, node)
+                        
+                        # 本层已由其他父节点到达的目标：记录同样最短的另一条路径
+                        same_level = bits & next_frontier.get(dependent, 0)
+                        if same_level and max_chains > 1:
+                            dependent_parents = parents[dependent]
+                            for index in _iter_bits(same_level):
+                                if len(dependent_parents[index]) < max_chains:
+                                    dependent_parents[index].append(node)
+                        
+                        new_bits = bits & ~dependent_mask
+                        if new_bits:
+                            masks[dependent] = dependent_mask | new_bits
+                            next_frontier[dependent] = next_frontier.get(dependent, 0) | new_bits
+                            dependent_parents = parents.setdefault(dependent, {})
+                            for index in _iter_bits(new_bits):
+                                dependent_parents[index] = [node]
+                frontier = next_frontier
+                depth += 1
+        
+        self.stats.count("nodes_visited", visited)
+        self.stats.count("edges_scanned", scanned)
+        return masks, parents
+    
+    @staticmethod
+    def _chain_links(node: str, index: int, parents: Dict[str, Dict[int, List[str]]], root: DependencyChain,
+                     limit: int, memo: Dict[str, List[DependencyChain]]) -> List[DependencyChain]:
+        """沿目标index的父指针构造到达node的最短依赖链条（最多limit条）
+        
+        memo为该目标的 源码包 -> 链条 表：每个源码包的链条只构造一次，后继的链条直接引用它们作为前缀，
+        因此总节点数与遍历到的(源码包, 目标)数成正比，而不是与链条总长度成正比。
+        """
+        chains = memo.get(node)
+        if chains is not None:
+            return chains
+        
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current in memo:
+                continue
+            current_parents = parents[current][index]
+            if not current_parents:
+                memo[current] = [DependencyChain(current, root)]
+                continue
+            
+            chains = []
+            for parent in current_parents:
+                prefixes = memo.get(parent)
+                if prefixes is None:
+                    break
+                for prefix in prefixes:
+                    if len(chains) >= limit:
+                        break
+                    chains.append(DependencyChain(current, prefix))
+            else:
+                memo[current] = chains
+                continue
+            # 父节点的链条尚未构造：先构造所有父节点，再回到当前节点
+            stack.append(current)
+            stack.extend(parent for parent in current_parents if parent not in memo)
+        return memo[node]
+    
+    def analyze_source_package_impact(self, source_package: str, no_all: str = "yes") -> Dict[str, Dict[str, any]]:
+        """分析源码包构建成功后的影响（源码包模式）
+        
+        Args:
+            source_package: 源码包名
+            no_all: 是否过滤all架构包
+            
+        Returns:
+            Dict: 受影响的源码包信息，包含依赖链条
+        """
+        print(f"\n分析源码包: {source_package}")
+        print("=" * 50)
+        
+        return self.analyze_many([source_package], "source", no_all)
+    
+    def analyze_many(self, targets: List[str], mode: str = "binary", no_all: str = "yes") -> Dict[str, Dict[str, any]]:
+        """批量分析多个目标，所有目标共享同一次源码包图遍历
+        
+        Args:
+            targets: 目标包名列表
+            mode: "binary" 以二进制包为目标；"source" 以源码包为目标（分析其所有二进制包）
+            no_all: 是否过滤all架构包
+            
+        Returns:
+            Dict: 受影响的源码包 -> {'info', 'category', 'arch', 'homepage', 'chains'}，
+                  chains为DependencyChain列表（"目标 -> 源码包1 -> 源码包2 -> ..."），按长度从短到长排列
+        """
+        final_source_deps = dict(self.iter_results(targets, mode, no_all))
+        logger.info("%d 个目标共影响 %d 个源码包", len(targets), len(final_source_deps))
+        return final_source_deps
+    
+    def iter_results(self, targets: List[str], mode: str = "binary", no_all: str = "yes"):
+        """与analyze_many相同，但在遍历完成后按发现顺序分批产生 (受影响源码包, 结果)，供流式输出使用
+        
+        所有目标共享的遍历不能中途产生结果，第一个结果要等整个遍历完成后才产生。
+        之后结果按批构造并产生：链条和记录每批产生后即丢弃，记录不在内存中累积；
+        只有链条节点保留在每个目标的memo中，供后继源码包共享前缀。
+        """
+        if mode not in ("binary", "source"):
+            raise ValueError(f"未知的分析模式: {mode}")
+        
+        parallel = self.workers > 1 and len(set(targets)) > 1
+        if parallel and "fork" not in multiprocessing.get_all_start_methods():
+            logger.warning("当前平台不支持fork，回退为单进程分析")
+            parallel = False
+        affected = self._traverse_parallel(targets, mode, no_all) if parallel else \
+            self._traverse_targets(targets, mode, no_all)
+        
+        # 结果按RESULT_BATCH_SIZE个源码包一批构造后产生，已产生的结果不在这里保留。链条节点和记录都不含循环引用，
+        # 构造期间暂停GC（与加载快照相同），但不跨越yield，调用方处理结果时GC照常运行。
+        # 结果在两次yield之间逐批生成，不能用phase计时（会把调用方输出的时间也算进来），只累计生成的时间；
+        # 构造链条和查找记录只是内存操作，CPU时间按墙钟时间近似，省去逐个调用开销较大的process_time
+        pending = iter(affected)
+        chain_time = lookup_time = 0.0
+        try:
+            while True:
+                batch = list(itertools.islice(pending, RESULT_BATCH_SIZE))
+                if not batch:
+                    break
+                start = time.perf_counter()
+                with _gc_paused():
+                    chains = [self._package_chains(source_pkg, reached) for source_pkg, reached in batch]
+                    built = time.perf_counter()
+                    results = []
+                    for (source_pkg, _), package_chains in zip(batch, chains):
+                        pkg_info = self.package_info(source_pkg)
+                        results.append((source_pkg, {
+                            'info': self._source_record(source_pkg),
+                            'category': pkg_info['category'],
+                            'arch': pkg_info['arch'],
+                            'homepage': pkg_info['homepage'],
+                            'chains': package_chains
+                        }))
+                del batch, chains
+                finished = time.perf_counter()
+                chain_time += built - start
+                lookup_time += finished - built
+                yield from results
+        finally:
+            self.stats.count("affected_packages", len(affected))
+            self.stats.record("chains", chain_time, chain_time, len(affected))
+            self.stats.record("package_info", lookup_time, lookup_time, len(affected))
+    
+    def _traverse_targets(self, targets: List[str], mode: str, no_all: str) -> List[tuple]:
+        """单进程遍历所有目标，返回按发现顺序排列的 (受影响源码包, [(目标掩码, 遍历结果)])，见_package_chains
+        
+        遍历结果为 (父节点表, 各目标的链条根节点, 各目标的 源码包 -> 链条 memo)。
+        """
+        seed_lists = self._seed_lists(targets, mode, no_all)
+        masks, parents = self._traverse_sources(seed_lists, no_all, self.max_depth, self.max_chains)
+        
+        # 重复的目标产生完全相同的链条，只使用第一次出现的序号
+        first_index = {}
+        for index, target in enumerate(targets):
+            first_index.setdefault(target, index)
+        unique_bits = sum(1 << index for index in first_index.values())
+        part = (parents, [DependencyChain(target) for target in targets], [{} for _ in targets])
+        return [(source_pkg, ((mask & unique_bits, part),)) for source_pkg, mask in masks.items()]
+    
+    def _package_chains(self, source_pkg: str, reached) -> List[DependencyChain]:
+        """受影响源码包的依赖链条：每个目标最多max_chains条，按长度稳定排序，最多保留max_package_chains条
+        
+        reached为到达该源码包的各组目标：(目标掩码, (父节点表, 链条根节点, memo))，按目标顺序排列；
+        memo为每个目标的 源码包 -> 链条 表，所有结果共享前缀节点。
+        """
+        if len(reached) == 1 and self.max_package_chains is None:
+            mask, (parents, roots, memos) = reached[0]
+            indexes = list(_iter_bits(mask))
+            if len(indexes) == 1:
+                index = indexes[0]
+                return self._chain_links(source_pkg, index, parents, roots[index], self.max_chains, memos[index])
+        chains = []
+        for mask, (parents, roots, memos) in reached:
+            for index in _iter_bits(mask):
+                chains.extend(self._chain_links(source_pkg, index, parents, roots[index], self.max_chains, memos[index]))
+        # 各目标的链条互不相同，只需按长度稳定排序并截断
+        chains.sort(key=len)
+        if self.max_package_chains is not None:
+            del chains[self.max_package_chains:]
+        return chains
+    
+    def _seed_lists(self, targets: List[str], mode: str, no_all: str) -> List[List[str]]:
+        """每个目标的起始源码包：直接构建依赖目标（或目标源码包的任一二进制包）的源码包"""
+        seed_lists = []
+        with self.stats.phase("analysis"):
+            for target in targets:
+                if mode == "binary":
+                    seeds = list(self.analysis(target, no_all))
+                else:
+                    binary_packages = self.get_binary_packages(target)
+                    if not binary_packages:
+                        logger.warning("源码包 '%s' 不存在或没有二进制包", target)
+                        seed_lists.append([])
+                        continue
+                    logger.debug("源码包 '%s' 产生 %d 个二进制包: %s",
+                                 target, len(binary_packages), ', '.join(binary_packages))
+                    seeds = {}
+                    for binary_pkg in binary_packages:
+                        seeds.update(self.analysis(binary_pkg, no_all))
+                    seeds = list(seeds)
+                seed_lists.append(seeds)
+        return seed_lists
+    
+    def build_order(self, targets: Optional[List[str]] = None, no_all: str = "yes") -> BuildOrder:
+        """计算重建一组源码包及受其影响的所有源码包时的分轮构建顺序
+        
+        在源码包依赖图上求强连通分量（构建依赖环），把每个分量缩成一个单元后按最长路径分层：
+        每一轮的单元只依赖之前各轮的单元，同一轮内可以并行构建。
+        
+        Args:
+            targets: 目标源码包（源码包模式）；None表示对整个归档排序
+            no_all: 是否过滤all架构包
+            
+        Returns:
+            BuildOrder: 分轮构建顺序和检测到的构建依赖环
+        """
+        graph = self._get_source_graph()
+        packages = self._get_packages()
+        
+        if targets is None:
+            nodes = [pkg_name for pkg_name, pkg in packages.items()
+                     if not (no_all.lower() == "yes" and pkg.architecture == 'all')]
+        else:
+            masks, _ = self._traverse_sources(self._seed_lists(targets, "source", no_all), no_all, self.max_depth)
+            # 目标源码包本身排在最前面重建
+            nodes = list(dict.fromkeys([target for target in targets if target in packages] + list(masks)))
+        
+        with self.stats.phase("build_order"):
+            node_set = set(nodes)
+            successors = lambda node: [dependent for dependent in graph.get(node, ()) if dependent in node_set]
+            components = strongly_connected_components(nodes, successors)
+            
+            # components为逆拓扑序，倒序遍历时每个分量的所有前驱都已确定轮次
+            component_of = {member: i for i, component in enumerate(components) for member in component}
+            wave_of = [0] * len(components)
+            for i in range(len(components) - 1, -1, -1):
+                next_wave = wave_of[i] + 1
+                for member in components[i]:
+                    for dependent in successors(member):
+                        j = component_of[dependent]
+                        if j != i and wave_of[j] < next_wave:
+                            wave_of[j] = next_wave
+            
+            waves = [[] for _ in range(max(wave_of, default=-1) + 1)]
+            cycles = []
+            for i, component in enumerate(components):
+                unit = tuple(sorted(component))
+                waves[wave_of[i]].append(unit)
+                if len(unit) > 1 or unit[0] in graph.get(unit[0], ()):
+                    cycles.append(unit)
+            for wave in waves:
+                wave.sort()
+            cycles.sort(key=lambda unit: (-len(unit), unit))
+        
+        logger.info("%d 个源码包分为 %d 轮构建，检测到 %d 个构建依赖环", len(nodes), len(waves), len(cycles))
+        return BuildOrder(waves, cycles)
+    
+    def export_build_order(self, order: BuildOrder, target_list: List[str], output_format: str) -> str:
+        """将分轮构建顺序导出为表格，每个源码包一行：轮次、包名、所在的构建依赖环、分类、架构"""
+        cycle_ids = {member: i + 1 for i, unit in enumerate(order.cycles) for member in unit}
+        columns = ['wave', 'package', 'cycle', 'category', 'arch']
+        rows = []
+        for wave_number, wave in enumerate(order.waves, 1):
+            for unit in wave:
+                for pkg_name in unit:
+                    pkg_info = self.package_info(pkg_name)
+                    rows.append({
+                        'wave': wave_number,
+                        'package': pkg_name,
+                        'cycle': cycle_ids.get(pkg_name),
+                        'category': pkg_info['category'],
+                        'arch': pkg_info['arch'],
+                    })
+        
+        return self._export_table(rows, columns, target_list, output_format, "build_order", "构建顺序")
+    
+    def _ranking_path(self) -> str:
+        """整个归档影响排名的缓存，与预解析快照一样放在Sources文件旁边"""
+        return self.sources_file + ".ranking"
+    
+    def _ranking_key(self, no_all: str) -> tuple:
+        """影响排名依赖的参数：过滤条件及所用Packages文件的状态"""
+        packages_state = []
+        for arch in self.packages_archs:
+            stat = os.stat(self._packages_file(arch))
+            packages_state.append((arch, stat.st_size, stat.st_mtime_ns))
+        profiles = tuple(sorted(self.profiles)) if self.profiles is not None else None
+        return (no_all.lower() == "yes", self.arch, profiles, tuple(packages_state))
+    
+    def impact_ranking(self, no_all: str = "yes") -> List[ImpactRank]:
+        """计算整个归档中每个源码包和二进制包直接或间接影响的源码包数及层数，按影响从大到小排序
+        
+        把源码包依赖图的强连通分量缩点成DAG，按逆拓扑序合并后继的可达集合（整数位图），
+        一次遍历得到所有包的结果，不需要逐个包做分析。可达集合按rank_block_size位分块计算，
+        每遍只保留一块位图，峰值内存与源码包数乘以块大小成正比。
+        结果按Sources文件（及过滤条件）缓存在Sources.ranking中，并保留在内存中供之后的调用使用。
+        
+        Args:
+            no_all: 是否过滤all架构包
+            
+        Returns:
+            List[ImpactRank]: 按受影响源码包数、层数从大到小排序
+        """
+        key = self._ranking_key(no_all)
+        ranking = self._cached_ranking(key)
+        if ranking is not None:
+            return ranking
+        
+        start = time.perf_counter()
+        with self.stats.phase("ranking"):
+            ranking = self._compute_impacts(no_all)
+        self._store_ranking(key, ranking)
+        logger.info("计算了 %d 个包的影响排名，耗时 %.3fs", len(ranking), time.perf_counter() - start)
+        return ranking
+    
+    def _cached_ranking(self, key: tuple) -> Optional[List[ImpactRank]]:
+        """返回内存中或Sources.ranking中与key匹配的影响排名，没有时返回None"""
+        if key in self._rankings:
+            self.stats.count("ranking_cache_hits")
+            return self._rankings[key]
+        if os.path.exists(self.sources_file):
+            with self.stats.phase("ranking_load"):
+                cached = self._read_ranking_file()
+                if key in cached:
+                    with _gc_paused():
+                        ranking = [_new_tuple(ImpactRank, row) for row in cached[key]]
+                    self._rankings[key] = ranking
+                    self.stats.count("ranking_cache_hits")
+                    return ranking
+        self.stats.count("ranking_cache_misses")
+        return None
+    
+    def _read_ranking_file(self) -> Dict[tuple, list]:
+        """读取Sources.ranking中与当前Sources匹配的各组排名（键为_ranking_key），没有时返回空字典"""
+        cached = self._read_snapshot(self._ranking_path(), self.sources_file)
+        return cached if isinstance(cached, dict) else {}
+    
+    def _store_ranking(self, key: tuple, ranking: List[ImpactRank]):
+        """排序后保存到内存和Sources.ranking
+        
+        Sources.ranking按_ranking_key保存多组排名，新结果与文件中基于同样Packages文件的
+        其他组（例如另一个no_all设置）合并，不会挤掉它们；Packages文件变化后的旧组被丢弃。
+        """
+        ranking.sort(key=lambda row: (-row.affected, -row.depth, row.kind, row.package))
+        if os.path.exists(self.sources_file):
+            entries = {other: rows for other, rows in self._read_ranking_file().items() if other[3] == key[3]}
+            entries[key] = [tuple(row) for row in ranking]
+            self._dump_snapshot(self._ranking_path(), self.sources_file, entries)
+        self._rankings[key] = ranking
+    
+    def _compute_impacts(self, no_all: str, sources: Optional[set] = None,
+                         binaries: Optional[set] = None) -> List[ImpactRank]:
+        """计算源码包和二进制包的影响（未排序），impact_ranking的核心
+        
+        sources/binaries为None时计算全部；否则只计算指定的包，遍历也只限于它们能到达的子图。
+        """
+        graph = self._get_source_graph()
+        packages = self._get_packages()
+        reverse_index = self._get_reverse_index()
+        skip_all = no_all.lower() == "yes"
         
-        if source_package_name not in packages:
-            return []
+        applicable = lambda pkg_name: not (skip_all and packages[pkg_name].architecture == 'all')
+        dependents_of = lambda binary: {dependent for name in self._dependency_names(binary)
+                                        for dependent in reverse_index.get(name, ()) if applicable(dependent)}
         
-        pkg_info = packages[source_package_name]
-        binary_field = pkg_info.get('Binary', '')
+        if sources is None:
+            nodes = [pkg_name for pkg_name in packages if applicable(pkg_name)]
+            binaries = {binary for pkg in packages.values() for binary in pkg.binaries}
+        else:
+            # 指定的包能到达的源码包集合（对后继封闭），影响只取决于这个子图
+            reached_set = {pkg_name for pkg_name in sources if pkg_name in packages and applicable(pkg_name)}
+            binaries = {binary for binary in (binaries or ()) if binary in self._binary_to_source}
+            for binary in binaries:
+                reached_set.update(dependents_of(binary))
+            stack = list(reached_set)
+            while stack:
+                for dependent in graph.get(stack.pop(), ()):
+                    if dependent not in reached_set and applicable(dependent):
+                        reached_set.add(dependent)
+                        stack.append(dependent)
+            nodes = [pkg_name for pkg_name in packages if pkg_name in reached_set]
         
-        if not binary_field:
-            return []
+        node_set = set(nodes)
+        successors = {node: [dependent for dependent in graph.get(node, ()) if dependent in node_set]
+                      for node in nodes}
         
-        # 解析Binary字段，包名之间用逗号分隔
-        binary_packages = []
-        for pkg in binary_field.split(','):
-            pkg = pkg.strip()
-            if pkg:
-                binary_packages.append(pkg)
+        # 缩点：分量按拓扑序编号，后继的编号总是更大
+        components = strongly_connected_components(nodes, successors.__getitem__)
+        components.reverse()
+        component_of = {member: i for i, component in enumerate(components) for member in component}
+        component_successors = [
+            sorted({component_of[dependent] for member in component for dependent in successors[member]} - {i})
+            for i, component in enumerate(components)
+        ]
         
-        return binary_packages
-    
-    def export_to_excel(self, comprehensive_result: Dict[str, Dict[str, str]], target_list: List[str]) -> str:
-        """将comprehensive_result导出到Excel文件"""
-        # 准备数据
-        data = []
-        for pkg_name, info in comprehensive_result.items():
-            data.append({
-                '包名': pkg_name,
-                '分类': info['category'],
-                '架构': info['arch'],
-                '主页': info['homepage'],
-                '依赖链条': info['dependency_chain']
-            })
-        
-        # 创建DataFrame
-        df = pd.DataFrame(data)
-        
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        target_names = "_".join(target_list[:3])  # 最多取前3个目标包名
-        if len(target_list) > 3:
-            target_names += f"_and_{len(target_list)-3}_more"
-        filename = f"dependency_analysis_{target_names}_{timestamp}.xlsx"
-        filepath = os.path.join(self.result_dir, filename)
+        # 每个分量的源码包在位图中占连续的位，按拓扑序排列
+        offsets = list(itertools.accumulate((len(component) for component in components), initial=0))
         
-        # 导出到Excel
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='依赖分析结果', index=False)
-            
-            # 获取工作表
-            worksheet = writer.sheets['依赖分析结果']
-            
-            # 调整列宽
-            worksheet.column_dimensions['A'].width = 25  # 包名
-            worksheet.column_dimensions['B'].width = 20  # 分类
-            worksheet.column_dimensions['C'].width = 15  # 架构
-            worksheet.column_dimensions['D'].width = 50  # 主页
-            worksheet.column_dimensions['E'].width = 80  # 依赖链条
-            
-            # 设置表头样式
-            from openpyxl.styles import Font, PatternFill, Alignment
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            
-            for cell in worksheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            # 设置数据行样式
-            for row in worksheet.iter_rows(min_row=2, max_row=len(data)+1):
-                for cell in row:
-                    cell.alignment = Alignment(vertical="top", wrap_text=True)
+        depth = [0] * len(components)
+        for i in range(len(components) - 1, -1, -1):
+            depth[i] = max((depth[j] + 1 for j in component_successors[i]), default=0)
         
-        return filepath
-    
-    def get_source_package_from_binary(self, binary_package: str) -> str:
-        """根据二进制包名找到对应的源码包名"""
-        packages = self._parse_sources_file()
+        # 二进制包 -> 直接构建依赖它（或它提供的虚包）的源码包所在的分量
+        binary_dependents = {}
+        for pkg in packages.values():
+            for binary in pkg.binaries:
+                if binary in binaries and binary not in binary_dependents:
+                    binary_dependents[binary] = sorted(component_of[dependent] for dependent in dependents_of(binary))
         
-        for source_pkg, pkg_info in packages.items():
-            binary_field = pkg_info.get('Binary', '')
-            if binary_field:
-                binary_packages = [pkg.strip() for pkg in binary_field.split(',')]
-                if binary_package in binary_packages:
-                    return source_pkg
+        reached = [0] * len(components)          # 后继可达的源码包数
+        binary_reached = dict.fromkeys(binary_dependents, 0)
+        block_size = max(1, self.rank_block_size)
+        for low in range(0, len(nodes), block_size):
+            high = low + block_size
+            # 编号不小于end的分量只能到达更靠后的位，对本块没有贡献
+            end = bisect.bisect_left(offsets, high, hi=len(components))
+            reach = [0] * end
+            for i in range(end - 1, -1, -1):
+                bits = 0
+                for j in component_successors[i]:
+                    if j >= end:
+                        break
+                    bits |= reach[j]
+                reached[i] += bits.bit_count()
+                # 加上分量自身落在本块中的位
+                first, last = max(offsets[i], low), min(offsets[i + 1], high)
+                if first < last:
+                    bits |= ((1 << (last - first)) - 1) << (first - low)
+                reach[i] = bits
+            
+            for binary, dependents in binary_dependents.items():
+                bits = 0
+                for j in dependents:
+                    if j >= end:
+                        break
+                    bits |= reach[j]
+                if bits:
+                    binary_reached[binary] += bits.bit_count()
+            del reach
         
-        # 如果没找到，假设源码包名和二进制包名相同
-        return binary_package
+        ranking = []
+        for i, component in enumerate(components):
+            for member in component:
+                if sources is None or member in sources:
+                    # 环中的其他源码包同样受影响
+                    ranking.append(ImpactRank(member, "source", member, reached[i] + len(component) - 1, depth[i]))
+        for binary, dependents in binary_dependents.items():
+            ranking.append(ImpactRank(binary, "binary", self._binary_to_source[binary], binary_reached[binary],
+                                      max((depth[j] + 1 for j in dependents), default=0)))
+        return ranking
     
-    def _find_source_dependencies(self, target_binary: str, no_all: str, visited_sources: set = None, depth: int = 0, max_depth: int = 10) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
-        """递归查找所有依赖的源码包（改进版）
+    def diff_archive(self, old_sources_file: str, no_all: str = "yes") -> ArchiveDiff:
+        """比较旧Sources文件与当前Sources文件，报告依赖关系的变化及影响发生变化的包
+        
+        两个归档逐个源码包比较，只为有变化的源码包解析依赖字段。当前归档没有预解析快照时，
+        反向索引由旧归档的索引按变化的依赖边增量更新，而不是重新扫描所有源码包；
+        影响排名只为能到达变化部分的源码包（及相关二进制包）重新计算，其余沿用旧归档的结果。
         
         Args:
-            target_binary: 目标二进制包名
+            old_sources_file: 旧的Sources文件
             no_all: 是否过滤all架构包
-            visited_sources: 已访问的源码包集合
-            depth: 当前深度
-            max_depth: 最大深度
             
         Returns:
-            Tuple[source_deps_info, source_dependency_chains]: (源码包信息, 源码包依赖链条)
+            ArchiveDiff: 包、依赖边、二进制包及影响的变化
         """
-        if visited_sources is None:
-            visited_sources = set()
+        start = time.perf_counter()
+        old = self._clone_config(old_sources_file)
+        old_packages = old._get_packages()
+        
+        # 当前归档：有快照时直接加载；否则只解析包表，反向索引稍后增量更新
+        parsed = False
+        if self._packages is None and not self._load_snapshot():
+            self._packages, self._binary_to_source, self._binary_owners = self._parse_sources_file()
+            parsed = True
+        packages = self._packages
+        
+        added = [name for name in packages if name not in old_packages]
+        removed = [name for name in old_packages if name not in packages]
+        changed = [name for name, pkg in packages.items()
+                   if name in old_packages and self._package_differs(old_packages[name], pkg)]
         
-        if depth > max_depth:
-            return {}, {}
+        added_edges, removed_edges, added_binaries, removed_binaries = [], [], [], []
+        touched = set()  # 出边（依赖它的源码包）或自身是否参与遍历发生变化的源码包
+        for name in itertools.chain(added, removed, changed):
+            old_pkg = old_packages.get(name)
+            new_pkg = packages.get(name)
+            old_deps = old._package_dependencies(old_pkg) if old_pkg else []
+            new_deps = self._package_dependencies(new_pkg) if new_pkg else []
+            old_dep_set, new_dep_set = set(old_deps), set(new_deps)
+            added_edges.extend((name, dep) for dep in new_deps if dep not in old_dep_set)
+            removed_edges.extend((name, dep) for dep in old_deps if dep not in new_dep_set)
+            
+            old_binaries = old_pkg.binaries if old_pkg else ()
+            new_binaries = new_pkg.binaries if new_pkg else ()
+            added_binaries.extend((name, binary) for binary in new_binaries if binary not in old_binaries)
+            removed_binaries.extend((name, binary) for binary in old_binaries if binary not in new_binaries)
+            
+            # 产生的二进制包变化时它的后继变化；架构变化时它是否被计入（no_all过滤）变化
+            if old_pkg is None or new_pkg is None or old_binaries != new_binaries or \
+                    old_pkg.architecture != new_pkg.architecture:
+                touched.add(name)
         
-        dependency_chain = {}
-        all_source_deps = {}
+        changed_names = {dep for _, dep in itertools.chain(added_edges, removed_edges)}
+        for dep in changed_names:
+            touched |= old._dependency_providers(dep) | self._dependency_providers(dep)
         
-        # 查找直接依赖于 target_binary 的所有源码包
-        direct_source_deps = self.analysis(target_binary, no_all)
+        if self._reverse_index is None:
+            self._patch_reverse_index(old._get_reverse_index(), added_edges, removed_edges)
+            self._source_graph = None
+        if parsed:
+            self._write_snapshot()
         
-        if depth <= 2:
-            print(f"INFO: 查找依赖于 '{target_binary}' 的源码包: 找到 {len(direct_source_deps)} 个")
+        # 影响排名：当前归档已有缓存时直接使用，否则增量更新旧归档的排名
+        old_ranking = old.impact_ranking(no_all)
+        key = self._ranking_key(no_all)
+        ranking = self._cached_ranking(key)
+        recomputed = 0
+        if ranking is None:
+            sources, binaries = self._impact_candidates(touched, changed_names)
+            recomputed = len(sources) + len(binaries)
+            kept = [row for row in old_ranking
+                    if row.package not in (sources if row.kind == "source" else binaries)
+                    and (row.package in packages if row.kind == "source" else row.package in self._binary_to_source)]
+            with self.stats.phase("ranking"):
+                ranking = kept + self._compute_impacts(no_all, sources, binaries)
+            self._store_ranking(key, ranking)
         
-        # 处理每个直接依赖的源码包
-        for source_pkg in direct_source_deps.keys():
-            if source_pkg in visited_sources:
-                continue
-                
-            visited_sources.add(source_pkg)
-            all_source_deps[source_pkg] = direct_source_deps[source_pkg]
-            dependency_chain[source_pkg] = [source_pkg]  # 初始为源码包本身
-            
-            # 获取这个源码包产生的所有二进制包
-            binary_packages = self.get_binary_packages(source_pkg)
-            
-            if depth <= 2:
-                print(f"INFO: 源码包 '{source_pkg}' 产生 {len(binary_packages)} 个二进制包")
-            
-            # 对该源码包的所有二进制包进行递归分析
-            for binary_pkg in binary_packages:
-                if binary_pkg != target_binary:  # 避免循环
-                    indirect_source_deps, indirect_chains = self._find_source_dependencies(
-                        binary_pkg, no_all, visited_sources.copy(), depth + 1, max_depth
-                    )
-                    
-                    # 合并间接依赖的源码包
-                    for indirect_source, indirect_info in indirect_source_deps.items():
-                        if indirect_source not in all_source_deps:
-                            all_source_deps[indirect_source] = indirect_info
-                            
-                            # 构建依赖链条：当前源码包 -> 间接源码包
-                            if indirect_source in indirect_chains:
-                                dependency_chain[indirect_source] = [source_pkg] + indirect_chains[indirect_source]
-                            else:
-                                dependency_chain[indirect_source] = [source_pkg, indirect_source]
-        
-        return all_source_deps, dependency_chain
+        old_rows = {(row.kind, row.package): row for row in old_ranking}
+        new_rows = {(row.kind, row.package): row for row in ranking}
+        impact_changes = []
+        for row_key in itertools.chain(new_rows, (row_key for row_key in old_rows if row_key not in new_rows)):
+            old_row, new_row = old_rows.get(row_key), new_rows.get(row_key)
+            if old_row is None or new_row is None or \
+                    (old_row.affected, old_row.depth) != (new_row.affected, new_row.depth):
+                impact_changes.append(ImpactChange(
+                    row_key[1], row_key[0],
+                    old_row.affected if old_row else None, new_row.affected if new_row else None,
+                    old_row.depth if old_row else None, new_row.depth if new_row else None,
+                ))
+        impact_changes.sort(key=lambda change: (-abs((change.new_affected or 0) - (change.old_affected or 0)),
+                                                change.kind, change.package))
+        
+        logger.info("比较 %s 与 %s: %d 个源码包有变化，重新计算了 %d 个包的影响，耗时 %.3fs",
+                    old_sources_file, self.sources_file, len(added) + len(removed) + len(changed), recomputed,
+                    time.perf_counter() - start)
+        return ArchiveDiff(added, removed, changed, added_edges, removed_edges,
+                           added_binaries, removed_binaries, impact_changes)
     
-    def analyze_source_package_impact(self, source_package: str, no_all: str = "yes") -> Dict[str, Dict[str, any]]:
-        """分析源码包构建成功后的影响（源码包模式）
+    @staticmethod
+    def _package_differs(old_pkg: SourcePackage, new_pkg: SourcePackage) -> bool:
+        """源码包中影响依赖分析的字段是否变化"""
+        return (old_pkg.binaries != new_pkg.binaries or old_pkg.build_depends != new_pkg.build_depends or
+                old_pkg.build_depends_indep != new_pkg.build_depends_indep or
+                old_pkg.architecture != new_pkg.architecture)
+    
+    def _patch_reverse_index(self, old_index: Dict[str, List[str]], added_edges: List[Tuple[str, str]],
+                             removed_edges: List[Tuple[str, str]]):
+        """按变化的依赖边更新旧的反向索引，结果与对当前包表重新构建的索引相同"""
+        index = dict(old_index)
+        modified = set()
+        for name, dep in removed_edges:
+            if dep not in modified:
+                index[dep] = list(index[dep])
+                modified.add(dep)
+            index[dep].remove(name)
+        for name, dep in added_edges:
+            if dep not in modified:
+                index[dep] = list(index.get(dep, ()))
+                modified.add(dep)
+            index[dep].append(name)
         
-        Args:
-            source_package: 源码包名
-            no_all: 是否过滤all架构包
-            
-        Returns:
-            Dict: 受影响的源码包信息，包含依赖链条
+        # 重新构建的索引按Sources文件顺序排列依赖者，这里保持一致
+        position = self._package_positions()
+        for dep in modified:
+            if index[dep]:
+                index[dep].sort(key=position.__getitem__)
+            else:
+                del index[dep]
+        self._reverse_index = index
+    
+    def _impact_candidates(self, touched: set, changed_names: set) -> Tuple[set, set]:
+        """影响可能变化的源码包和二进制包
+        
+        源码包的影响只取决于它能到达的子图，因此只有能到达touched中某个源码包的源码包需要重新计算；
+        二进制包需要重新计算的情况：依赖它的源码包集合变化（changed_names），或依赖它的源码包需要重新计算。
         """
-        print(f"\n分析源码包: {source_package}")
-        print("=" * 50)
+        graph = self._get_source_graph()
+        packages = self._get_packages()
         
-        # 获取该源码包产生的所有二进制包
-        binary_packages = self.get_binary_packages(source_package)
+        predecessors = defaultdict(list)
+        for pkg_name, dependents in graph.items():
+            for dependent in dependents:
+                predecessors[dependent].append(pkg_name)
         
-        if not binary_packages:
-            print(f"WARNING: 源码包 '{source_package}' 不存在或没有二进制包")
-            return {}
+        sources = {name for name in touched if name in packages}
+        stack = list(sources)
+        while stack:
+            for predecessor in predecessors.get(stack.pop(), ()):
+                if predecessor not in sources:
+                    sources.add(predecessor)
+                    stack.append(predecessor)
         
-        print(f"INFO: 源码包 '{source_package}' 产生 {len(binary_packages)} 个二进制包: {', '.join(binary_packages)}")
+        self._get_provided_names()
+        names = set(changed_names)
+        for pkg_name in sources:
+            names.update(self._package_dependencies(packages[pkg_name]))
+            names.update(packages[pkg_name].binaries)
+        binaries = set()
+        for name in names:
+            if name in self._binary_to_source:
+                binaries.add(name)
+            binaries.update(self._provides.get(name, ()))
+        return sources, binaries
+    
+    def _export_table(self, rows: List[Dict[str, any]], columns: List[str], target_list: List[str],
+                      output_format: str, prefix: str, sheet_name: str) -> str:
+        """把一组行（以列名为键的字典）写入指定格式的输出后端，返回文件路径"""
+        with self.stats.phase("export"):
+            writer = self._open_writer(output_format, target_list, columns, prefix, sheet_name)
+            try:
+                for row in rows:
+                    writer.write_row(row)
+            except BaseException:
+                writer.discard()
+                raise
+            return writer.close()
+    
+    def _traverse_parallel(self, targets: List[str], mode: str, no_all: str) -> List[tuple]:
+        """把目标分成workers块交给进程池分别遍历，合并成与_traverse_targets相同的结果和顺序
         
-        # 对每个二进制包进行依赖分析
-        all_affected_sources = {}
+        源码包表、索引和依赖图在创建进程池前加载完毕，工作进程通过fork以写时复制方式继承。
+        每块只传回目标掩码和父节点表（同一个包名在每块中只序列化一次），链条由主进程像单进程时一样构造。
+        重复的目标在分块前去掉，各块的目标互不相同，不同块的链条不会重复，合并时不需要去重；
+        各块内仍由所有目标共享一次遍历，因此只分成与进程数相同的块。
+        """
+        global _worker_analyzer
         
-        for binary_pkg in binary_packages:
-            print(f"\n分析二进制包: {binary_pkg}")
-            print("-" * 30)
-            
-            # 查找依赖于该二进制包的源码包
-            source_deps, source_chains = self._find_source_dependencies(binary_pkg, no_all, max_depth=5)
-            
-            print(f"找到 {len(source_deps)} 个依赖的源码包")
-            
-            # 处理每个受影响的源码包
-            for affected_source, chain in source_chains.items():
-                # 构建以源码包开头的依赖链条
-                full_chain = f"{source_package} -> {' -> '.join(chain)}"
-                
-                if affected_source in all_affected_sources:
-                    # 如果已存在，添加新的依赖链条
-                    if full_chain not in all_affected_sources[affected_source]['chains']:
-                        all_affected_sources[affected_source]['chains'].append(full_chain)
-                else:
-                    # 新的受影响源码包
-                    pkg_info = self.package_info(affected_source)
-                    all_affected_sources[affected_source] = {
-                        'info': source_deps[affected_source],
-                        'category': pkg_info['category'],
-                        'arch': pkg_info['arch'],
-                        'homepage': pkg_info['homepage'],
-                        'chains': [full_chain]
-                    }
-                
-                print(f"  {affected_source}: {source_package} -> {' -> '.join(chain)}")
+        # 在fork之前准备好所有只读数据
+        self._get_packages()
+        self._get_source_graph()
+        self._package_positions()
+        
+        unique_targets = list(dict.fromkeys(targets))
+        workers = min(self.workers, len(unique_targets))
+        chunk_size = -(-len(unique_targets) // workers)
+        offsets = range(0, len(unique_targets), chunk_size)
+        chunks = [unique_targets[offset:offset + chunk_size] for offset in offsets]
         
-        return all_affected_sources
+        logger.info("使用 %d 个进程并行遍历 %d 个目标", len(chunks), len(unique_targets))
+        
+        _worker_analyzer = self
+        try:
+            with self.stats.phase("parallel"), multiprocessing.get_context("fork").Pool(len(chunks)) as pool:
+                partial_results = pool.starmap(_traverse_chunk, [(chunk, offset, mode, no_all)
+                                                                 for chunk, offset in zip(chunks, offsets)])
+        finally:
+            _worker_analyzer = None
+        
+        # 按块（即目标）顺序合并到达每个源码包的各组目标，再按单进程遍历中的发现顺序排列
+        with self.stats.phase("merge"):
+            merged = {}
+            for chunk, (masks, parents, keys, (phases, counters)) in zip(chunks, partial_results):
+                self.stats.merge_worker(phases, counters)
+                part = (parents, [DependencyChain(target) for target in chunk], [{} for _ in chunk])
+                for (source_pkg, mask), key in zip(masks.items(), keys):
+                    entry = merged.get(source_pkg)
+                    if entry is None:
+                        merged[source_pkg] = [key, [(mask, part)]]
+                    else:
+                        entry[0] = min(entry[0], key)
+                        entry[1].append((mask, part))
+            return [(source_pkg, reached) for source_pkg, (_, reached)
+                    in sorted(merged.items(), key=lambda item: item[1][0])]
+    
+    def _order_keys(self, masks: Dict[str, int], origins: Dict[str, tuple], offset: int) -> List[tuple]:
+        """masks中每个源码包在单进程遍历中的发现顺序键（按masks的顺序），用于合并各块的遍历结果
+        
+        单进程遍历时，起始源码包按目标顺序和起始列表顺序最先加入；其他源码包在最早到达它的一层加入，
+        由该层到达它的父节点中排在Sources最前面的一个展开，同一父节点的后继按依赖图中的顺序加入。
+        每个目标逐层到达的源码包与其他目标无关，因此各块的键取最小值就是所有目标一起遍历时的键。
+        """
+        graph = self._get_source_graph()
+        position = self._package_positions().__getitem__
+        ranks = {}
+        keys = []
+        for source_pkg in masks:
+            origin = origins[source_pkg]
+            if origin[0] == 0:
+                keys.append((0, offset + origin[1], origin[2]))
+                continue
+            depth, parent = origin
+            rank = ranks.get(parent)
+            if rank is None:
+                rank = ranks[parent] = {dependent: i for i, dependent in enumerate(graph[parent])}
+            keys.append((depth, position(parent), rank[source_pkg]))
+        return keys
     
     def main(self):
         """主流程控制（支持二进制包和源码包模式）"""
         # 第一步：初始化环境
         self.init()
         
-        # 第二步：选择分析模式
+        # 第二步：交互式选择分析模式和目标
+        return self.interactive()
+    
+    def interactive(self):
+        """交互式选择分析模式、目标包和过滤选项"""
         print("请选择分析模式:")
         print("1. 二进制包模式 - 以具体的二进制包为目标")
         print("2. 源码包模式 - 以源码包为目标，分析整个源码包的影响")
+        print("3. 构建顺序模式 - 以源码包为目标，计算重建受影响源码包的分轮顺序")
+        print("4. 影响排名模式 - 计算整个归档中每个包影响的源码包数")
+        print("5. 归档比较模式 - 比较旧Sources文件与当前Sources的依赖关系和影响变化")
         
-        mode_input = input("请输入模式编号 (1 或 2, 默认1): ").strip()
+        mode_input = input("请输入模式编号 (1-5, 默认1): ").strip()
         if mode_input == "2":
             return self._main_source_mode()
+        elif mode_input == "3":
+            return self._main_build_order_mode()
+        elif mode_input == "4":
+            return self._main_rank_mode()
+        elif mode_input == "5":
+            return self._main_diff_mode()
         else:
             return self._main_binary_mode()
     
@@ -393,48 +2407,14 @@ class PackageDependencyAnalyzer:
         target_list = [t.strip() for t in target_input.split(',') if t.strip()]
         
         if not target_list:
-            print("ERROR: 未提供有效的目标包名")
-            return
+            raise ValueError("未提供有效的目标包名")
         
         # 接收过滤选项
         filter_input = input("是否过滤纯all包？(yes/no，默认yes): ").strip()
         if not filter_input:
             filter_input = "yes"
         
-        # 分析每个目标包（源码包级别）
-        final_source_deps = {}
-        
-        for target in target_list:
-            print(f"\n分析目标二进制包: {target}")
-            print("=" * 50)
-            
-            # 查承所有依赖的源码包
-            source_deps, source_chains = self._find_source_dependencies(target, filter_input)
-            
-            print(f"找到 {len(source_deps)} 个依赖的源码包")
-            
-            # 显示结果
-            for source_pkg, chain in source_chains.items():
-                print(f"  {source_pkg}: {' -> '.join(chain)}")
-                
-                # 合并到最终结果中
-                if source_pkg in final_source_deps:
-                    # 如果已存在，添加新的依赖链条
-                    chain_str = f"{target} -> {' -> '.join(chain)}"
-                    if chain_str not in final_source_deps[source_pkg]['chains']:
-                        final_source_deps[source_pkg]['chains'].append(chain_str)
-                else:
-                    # 新源码包
-                    pkg_info = self.package_info(source_pkg)
-                    final_source_deps[source_pkg] = {
-                        'info': source_deps[source_pkg],
-                        'category': pkg_info['category'],
-                        'arch': pkg_info['arch'],
-                        'homepage': pkg_info['homepage'],
-                        'chains': [f"{target} -> {' -> '.join(chain)}"]
-                    }
-        
-        return self._output_results(final_source_deps, target_list, "二进制包")
+        return self.run("binary", target_list, filter_input)
     
     def _main_source_mode(self):
         """源码包模式的主流程"""
@@ -445,76 +2425,1015 @@ class PackageDependencyAnalyzer:
         target_list = [t.strip() for t in target_input.split(',') if t.strip()]
         
         if not target_list:
-            print("ERROR: 未提供有效的目标源码包名")
-            return
+            raise ValueError("未提供有效的目标源码包名")
+        
+        # 接收过滤选项
+        filter_input = input("是否过滤纯all包？(yes/no，默认yes): ").strip()
+        if not filter_input:
+            filter_input = "yes"
+        
+        return self.run("source", target_list, filter_input)
+    
+    def _main_build_order_mode(self):
+        """构建顺序模式的主流程"""
+        print("\n=== 构建顺序模式 ===")
+        
+        # 接收目标源码包列表
+        target_input = input("请输入要重建的目标源码包名（用逗号分隔）: ").strip()
+        target_list = [t.strip() for t in target_input.split(',') if t.strip()]
+        
+        if not target_list:
+            raise ValueError("未提供有效的目标源码包名")
+        
+        # 接收过滤选项
+        filter_input = input("是否过滤纯all包？(yes/no，默认yes): ").strip()
+        if not filter_input:
+            filter_input = "yes"
+        
+        return self.run("build-order", target_list, filter_input)
+    
+    def _main_rank_mode(self):
+        """影响排名模式的主流程"""
+        print("\n=== 影响排名模式 ===")
+        
+        # 目标可以为空，表示输出整个排名
+        target_input = input("请输入要查看的包名（用逗号分隔，留空输出整个排名）: ").strip()
+        target_list = [t.strip() for t in target_input.split(',') if t.strip()]
+        
+        # 接收过滤选项
+        filter_input = input("是否过滤纯all包？(yes/no，默认yes): ").strip()
+        if not filter_input:
+            filter_input = "yes"
+        
+        return self.run("rank", target_list, filter_input)
+    
+    def _main_diff_mode(self):
+        """归档比较模式的主流程"""
+        print("\n=== 归档比较模式 ===")
+        
+        old_sources_file = input(f"请输入旧Sources文件路径（默认{self._previous_sources_path()}）: ").strip()
+        old_sources_file = old_sources_file or self._previous_sources_path()
+        if not os.path.exists(old_sources_file):
+            raise FileNotFoundError(f"旧Sources文件不存在: {old_sources_file}")
         
         # 接收过滤选项
         filter_input = input("是否过滤纯all包？(yes/no，默认yes): ").strip()
         if not filter_input:
             filter_input = "yes"
         
-        # 分析每个目标源码包
-        final_source_deps = {}
+        return self.run("diff", [old_sources_file], filter_input)
+    
+    def run(self, mode: str, target_list: List[str], no_all: str = "yes", output_formats: List[str] = ("excel",),
+            print_results: bool = True) -> List[str]:
+        """非交互地分析一组目标并输出结果
         
-        for source_package in target_list:
-            affected_sources = self.analyze_source_package_impact(source_package, filter_input)
+        Args:
+            mode: "binary"、"source"、"build-order"（以源码包为目标，输出分轮构建顺序）
+                  "rank"（整个归档的影响排名，target_list为空时输出全部）
+                  或 "diff"（target_list[0]为旧Sources文件，为空时使用Sources.prev）
+            target_list: 目标包名列表
+            no_all: 是否过滤all架构包
+            output_formats: 结果导出格式，可选 excel/csv/jsonl/parquet，为空时不导出文件
+            print_results: 是否在控制台逐个打印受影响源码包
             
-            # 合并结果
-            for source_pkg, data in affected_sources.items():
-                if source_pkg in final_source_deps:
-                    # 合并依赖链条
-                    for chain in data['chains']:
-                        if chain not in final_source_deps[source_pkg]['chains']:
-                            final_source_deps[source_pkg]['chains'].append(chain)
-                else:
-                    final_source_deps[source_pkg] = data
+        Returns:
+            List[str]: 生成的结果文件路径
+        """
+        if mode == "build-order":
+            return self._output_build_order(target_list, no_all, output_formats, print_results)
+        if mode == "rank":
+            return self._output_ranking(target_list, no_all, output_formats, print_results)
+        if mode == "diff":
+            old_sources_file = target_list[0] if target_list else self._previous_sources_path()
+            return self._output_diff(old_sources_file, no_all, output_formats, print_results)
+        
+        mode_name = "二进制包" if mode == "binary" else "源码包"
+        
+        # 所有目标共享一次遍历（源码包级别）
+        print(f"\n分析目标{mode_name}: {', '.join(target_list)}")
+        print("=" * 50)
+        results = self.iter_results(target_list, mode, no_all)
         
-        return self._output_results(final_source_deps, target_list, "源码包")
+        return self._output_results(results, target_list, mode_name, output_formats, print_results)
     
-    def _output_results(self, final_source_deps: dict, target_list: list, mode_name: str):
-        """输出最终结果"""
+    def _output_results(self, results, target_list: list, mode_name: str, output_formats: List[str] = ("excel",),
+                        print_results: bool = True) -> List[str]:
+        """逐个消费 (受影响源码包, 结果)，打印到控制台并写入各输出后端"""
+        writers = []
+        try:
+            for output_format in output_formats:
+                writers.append(self._open_writer(output_format, target_list))
+        except BaseException:
+            # 某个输出后端无法创建（例如缺少pyarrow）：删除已经创建的文件，不留下只有表头的结果
+            for writer in writers:
+                writer.discard()
+            raise
+        
+        if print_results:
+            print(f"\n源码包依赖结果 ({mode_name}模式):")
+            print("=" * 80)
+        
+        # 分析在首次取结果时进行，其中的阶段单独计时；output只包含打印和写入结果的时间
+        with self.stats.phase("output"):
+            count = 0
+            try:
+                for source_pkg, data in results:
+                    count += 1
+                    if print_results:
+                        print(f"源码包: {source_pkg}")
+                        print(f"  分类: {data['category']}")
+                        print(f"  架构: {data['arch']}")
+                        print(f"  主页: {data['homepage']}")
+                        print(f"  依赖链条: {'; '.join(render_chains(data['chains']))}")
+                        print("-" * 40)
+                    
+                    for writer in writers:
+                        writer.write(source_pkg, data)
+            except BaseException:
+                # 分析中断：关闭已打开的流式文件，不再导出Excel
+                for writer in writers:
+                    if not isinstance(writer, ExcelResultWriter):
+                        writer.close()
+                raise
+            
+            filepaths = []
+            for writer in writers:
+                if isinstance(writer, ExcelResultWriter) and count:
+                    print(f"\n正在导出结果到Excel...")
+                filepath = writer.close()
+                if filepath:
+                    filepaths.append(filepath)
+                    print(f"结果文件已保存到: {filepath}")
+        
         print(f"\n分析完成！")
         print(f"共分析了 {len(target_list)} 个目标{mode_name}")
-        print(f"找到 {len(final_source_deps)} 个唯一的受影响源码包")
-        print(f"\n源码包依赖结果 ({mode_name}模式):")
-        print("=" * 80)
-        
-        # 准备导出数据
-        comprehensive_result = {}
-        for source_pkg, data in final_source_deps.items():
-            print(f"源码包: {source_pkg}")
-            print(f"  分类: {data['category']}")
-            print(f"  架构: {data['arch']}")
-            print(f"  主页: {data['homepage']}")
-            print(f"  依赖链条: {'; '.join(data['chains'])}")
-            print("-" * 40)
-            
-            comprehensive_result[source_pkg] = {
-                'category': data['category'],
-                'arch': data['arch'],
-                'homepage': data['homepage'],
-                'dependency_chain': '; '.join(data['chains'])
+        print(f"找到 {count} 个唯一的受影响源码包")
+        
+        return filepaths
+
+    def _output_build_order(self, target_list: List[str], no_all: str, output_formats: List[str] = ("excel",),
+                            print_results: bool = True) -> List[str]:
+        """计算目标源码包的分轮构建顺序，打印并导出"""
+        print(f"\n计算重建顺序: {', '.join(target_list)}")
+        print("=" * 50)
+        order = self.build_order(target_list, no_all)
+        
+        if print_results:
+            print(f"\n分轮构建顺序:")
+            print("=" * 80)
+            for wave_number, wave in enumerate(order.waves, 1):
+                units = [unit[0] if len(unit) == 1 else f"({' '.join(unit)})" for unit in wave]
+                print(f"第 {wave_number} 轮（{len(units)} 个）: {', '.join(units)}")
+        
+        if order.cycles:
+            print(f"\n构建依赖环（需要引导构建）:")
+            for unit in order.cycles:
+                print(f"  {' <-> '.join(unit) if len(unit) > 1 else unit[0] + '（自依赖）'}")
+        
+        filepaths = []
+        if any(order.waves):
+            for output_format in output_formats:
+                filepath = self.export_build_order(order, target_list, output_format)
+                filepaths.append(filepath)
+                print(f"结果文件已保存到: {filepath}")
+        
+        print(f"\n分析完成！")
+        print(f"共 {sum(len(unit) for wave in order.waves for unit in wave)} 个源码包，"
+              f"分为 {len(order.waves)} 轮构建，{len(order.cycles)} 个构建依赖环")
+        
+        return filepaths
+
+    def _output_ranking(self, target_list: List[str], no_all: str, output_formats: List[str] = ("excel",),
+                        print_results: bool = True) -> List[str]:
+        """输出整个归档的影响排名；指定目标时只输出这些包（源码包或二进制包）所在的行"""
+        print(f"\n计算整个归档的影响排名")
+        print("=" * 50)
+        ranking = self.impact_ranking(no_all)
+        if target_list:
+            wanted = set(target_list)
+            ranking = [row for row in ranking if row.package in wanted]
+        
+        if print_results:
+            shown = ranking if target_list else ranking[:self.rank_top]
+            print(f"\n影响排名{'' if target_list else f'（前 {len(shown)} 个）'}:")
+            print("=" * 80)
+            for position, row in enumerate(shown, 1):
+                kind = "源码包" if row.kind == "source" else f"二进制包（源码包 {row.source}）"
+                print(f"{position:>5}. {row.package} [{kind}]: 影响 {row.affected} 个源码包，{row.depth} 层")
+        
+        filepaths = []
+        if ranking:
+            rows = [row._asdict() for row in ranking]
+            for output_format in output_formats:
+                filepath = self._export_table(rows, list(ImpactRank._fields), target_list or ["all"],
+                                              output_format, "impact_ranking", "影响排名")
+                filepaths.append(filepath)
+                print(f"结果文件已保存到: {filepath}")
+        
+        print(f"\n分析完成！")
+        print(f"共 {len(ranking)} 行影响排名")
+        
+        return filepaths
+
+    def _output_diff(self, old_sources_file: str, no_all: str, output_formats: List[str] = ("excel",),
+                     print_results: bool = True) -> List[str]:
+        """比较两个Sources文件，打印并导出依赖关系和影响的变化"""
+        print(f"\n比较归档: {old_sources_file} -> {self.sources_file}")
+        print("=" * 50)
+        with self.stats.phase("diff"):
+            diff = self.diff_archive(old_sources_file, no_all)
+        
+        if print_results:
+            print(f"\n依赖关系变化:")
+            print("=" * 80)
+            for name, dep in diff.added_edges:
+                print(f"  + {name} 构建依赖 {dep}")
+            for name, dep in diff.removed_edges:
+                print(f"  - {name} 不再构建依赖 {dep}")
+            for name, binary in diff.added_binaries:
+                print(f"  + {name} 产生二进制包 {binary}")
+            for name, binary in diff.removed_binaries:
+                print(f"  - {name} 不再产生二进制包 {binary}")
+            
+            shown = diff.impact_changes[:self.rank_top]
+            print(f"\n影响变化最大的包（前 {len(shown)} 个）:")
+            print("=" * 80)
+            for change in shown:
+                old_affected = '-' if change.old_affected is None else change.old_affected
+                new_affected = '-' if change.new_affected is None else change.new_affected
+                kind = "源码包" if change.kind == "source" else "二进制包"
+                print(f"  {change.package} [{kind}]: 影响 {old_affected} -> {new_affected} 个源码包")
+        
+        rows = [{'change': change, 'package': name, 'detail': '', 'old_affected': None, 'new_affected': None,
+                 'old_depth': None, 'new_depth': None}
+                for change, names in (('package-added', diff.added_packages), ('package-removed', diff.removed_packages),
+                                      ('package-changed', diff.changed_packages))
+                for name in names]
+        rows += [{'change': change, 'package': name, 'detail': detail, 'old_affected': None, 'new_affected': None,
+                  'old_depth': None, 'new_depth': None}
+                 for change, pairs in (('edge-added', diff.added_edges), ('edge-removed', diff.removed_edges),
+                                       ('binary-added', diff.added_binaries), ('binary-removed', diff.removed_binaries))
+                 for name, detail in pairs]
+        rows += [{'change': 'impact-changed', 'package': change.package, 'detail': change.kind,
+                  'old_affected': change.old_affected, 'new_affected': change.new_affected,
+                  'old_depth': change.old_depth, 'new_depth': change.new_depth}
+                 for change in diff.impact_changes]
+        
+        filepaths = []
+        if rows:
+            columns = ['change', 'package', 'detail', 'old_affected', 'new_affected', 'old_depth', 'new_depth']
+            for output_format in output_formats:
+                filepath = self._export_table(rows, columns, [os.path.basename(old_sources_file)], output_format,
+                                              "archive_diff", "归档差异")
+                filepaths.append(filepath)
+                print(f"结果文件已保存到: {filepath}")
+        
+        print(f"\n分析完成！")
+        print(f"新增 {len(diff.added_packages)} 个、删除 {len(diff.removed_packages)} 个、"
+              f"变化 {len(diff.changed_packages)} 个源码包；依赖边 +{len(diff.added_edges)}/-{len(diff.removed_edges)}；"
+              f"{len(diff.impact_changes)} 个包的影响发生变化")
+        
+        return filepaths
+
+
+# 并行分析时由主进程设置，工作进程通过fork继承（见_traverse_parallel）
+_worker_analyzer = None
+# 并行准备多个suite时由主进程设置，工作进程通过fork继承（见SuiteSet.load）
+_worker_suites = None
+
+
+def _traverse_chunk(targets: List[str], offset: int, mode: str, no_all: str) -> tuple:
+    """工作进程入口：用继承自主进程的分析器遍历一块目标（在去重后的目标中从offset开始），
+    返回目标掩码、父节点表、发现顺序键（见_order_keys）和本块的统计（见RunStats.export）"""
+    analyzer = _worker_analyzer
+    # 每块单独统计，随结果一起传回主进程合并；工作进程的INFO日志对用户没有意义
+    analyzer.stats = RunStats()
+    logger.setLevel(max(logger.getEffectiveLevel(), logging.WARNING))
+    origins = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        seed_lists = analyzer._seed_lists(targets, mode, no_all)
+        masks, parents = analyzer._traverse_sources(seed_lists, no_all, analyzer.max_depth, analyzer.max_chains, origins)
+        keys = analyzer._order_keys(masks, origins, offset)
+    return masks, parents, keys, analyzer.stats.export()
+
+
+def _prepare_suite(suite: str, download: bool, force: bool) -> tuple:
+    """工作进程入口：下载一个suite并解析，写入预解析快照供主进程加载，返回本进程的统计（见RunStats.export）"""
+    analyzer = _worker_suites[suite]
+    analyzer.stats = RunStats()
+    if download:
+        analyzer.init(force)
+    if not analyzer._snapshot_current():
+        analyzer._load_archive()
+    return analyzer.stats.export()
+
+
+class SuiteSet:
+    """在同一会话中分析多个发行版（suite），例如 trixie 与 sid、bookworm
+    
+    每个suite由一个配置相同（组件、过滤条件、遍历选项等）的分析器负责，使用各自的Sources文件。
+    load()并行下载和解析所有suite，之后建立合并索引（包名 -> 包含它的suite位图）；
+    各suite的包表、二进制包映射和合并索引共享同一批intern的包名字符串。
+    查询可以针对单个suite，也可以跨suite比较（例如在trixie中受影响、在sid中不受影响的源码包），
+    都只使用已加载的索引，不重新解析。
+    """
+    
+    def __init__(self, analyzer: PackageDependencyAnalyzer, suites: List[str],
+                 sources_files: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            analyzer: 提供配置的分析器；与它的suite同名的suite使用它的Sources文件
+            suites: suite名列表，顺序即输出中的顺序
+            sources_files: suite -> 本地Sources文件，这些suite不下载
+        """
+        self.analyzer = analyzer
+        self.local = dict(sources_files or {})
+        self.analyzers = {}
+        for suite in dict.fromkeys(suites):
+            member = analyzer._clone_config(self.local.get(suite) or self._default_sources_file(analyzer, suite))
+            member.suite = suite
+            member.workers = analyzer.workers
+            self.analyzers[suite] = member
+        # 合并索引：源码包名/二进制包名 -> 包含它的suite位图（位序与self.analyzers相同）
+        self.source_suites = None
+        self.binary_suites = None
+    
+    @staticmethod
+    def _default_sources_file(analyzer: PackageDependencyAnalyzer, suite: str) -> str:
+        """analyzer本身的suite沿用它的Sources文件，其他suite放在同目录下以suite命名的子目录中"""
+        if suite == analyzer.suite:
+            return analyzer.sources_file
+        return os.path.join(os.path.dirname(analyzer.sources_file), suite, "Sources")
+    
+    def _mask(self, suites) -> int:
+        bits = {suite: 1 << i for i, suite in enumerate(self.analyzers)}
+        mask = 0
+        for suite in suites:
+            if suite not in bits:
+                raise ValueError(f"未知的suite: {suite}")
+            mask |= bits[suite]
+        return mask
+    
+    def _names(self, mask: int) -> Tuple[str, ...]:
+        return tuple(suite for i, suite in enumerate(self.analyzers) if mask >> i & 1)
+    
+    def load(self, offline: bool = False, force: bool = False):
+        """下载（offline为False时；使用本地Sources文件的suite除外）并解析所有suite，然后建立合并索引
+        
+        需要下载或重新解析的suite各由一个fork出的工作进程处理，同时进行；工作进程写入预解析快照，
+        主进程随后只加载快照。快照中的包名保持intern，加载后各suite共享同一个字符串对象。
+        """
+        global _worker_suites
+        
+        jobs = []
+        for suite, analyzer in self.analyzers.items():
+            download = not offline and suite not in self.local
+            if download:
+                os.makedirs(os.path.dirname(analyzer.sources_file) or ".", exist_ok=True)
+            elif not os.path.exists(analyzer.sources_file):
+                raise FileNotFoundError(f"{suite} 的Sources文件不存在: {analyzer.sources_file}")
+            # 不需要下载且快照有效的suite直接由主进程加载
+            if download or not analyzer._snapshot_current():
+                jobs.append((suite, download, force))
+        
+        stats = self.analyzer.stats
+        if len(jobs) > 1 and "fork" in multiprocessing.get_all_start_methods():
+            logger.info("使用 %d 个进程并行准备 %s", len(jobs), ', '.join(job[0] for job in jobs))
+            _worker_suites = self.analyzers
+            try:
+                with stats.phase("suites"), multiprocessing.get_context("fork").Pool(len(jobs)) as pool:
+                    for phases, counters in pool.starmap(_prepare_suite, jobs):
+                        stats.merge_worker(phases, counters)
+            finally:
+                _worker_suites = None
+        else:
+            for suite, download, force in jobs:
+                if download:
+                    self.analyzers[suite].init(force)
+        
+        for analyzer in self.analyzers.values():
+            analyzer._get_packages()
+        self._build_index()
+    
+    def _build_index(self):
+        """合并各suite的源码包名和二进制包名，记录每个名字出现在哪些suite中"""
+        source_suites = {}
+        binary_suites = {}
+        with self.analyzer.stats.phase("merge"):
+            for i, analyzer in enumerate(self.analyzers.values()):
+                bit = 1 << i
+                for name in analyzer._packages:
+                    source_suites[name] = source_suites.get(name, 0) | bit
+                for name in analyzer._binary_to_source:
+                    binary_suites[name] = binary_suites.get(name, 0) | bit
+        self.source_suites = source_suites
+        self.binary_suites = binary_suites
+        
+        everywhere = (1 << len(self.analyzers)) - 1
+        logger.info("合并索引（%s）: %d 个源码包（%d 个在所有suite中都有），%d 个二进制包",
+                    ', '.join(self.analyzers), len(source_suites),
+                    sum(1 for mask in source_suites.values() if mask == everywhere), len(binary_suites))
+    
+    def suites_of(self, name: str, kind: str = "source") -> List[str]:
+        """包含源码包（kind为"source"）或二进制包（"binary"）name的suite"""
+        index = self.source_suites if kind == "source" else self.binary_suites
+        return list(self._names(index.get(name, 0)))
+    
+    def analyze(self, targets: List[str], mode: str = "binary", no_all: str = "yes",
+                suites: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, any]]]:
+        """在每个suite（或指定的suites）中分别执行analyze_many，返回 suite -> 受影响的源码包 -> 结果"""
+        results = {}
+        for suite in suites or self.analyzers:
+            if suite not in self.analyzers:
+                raise ValueError(f"未知的suite: {suite}")
+            logger.info("分析 %s", suite)
+            results[suite] = self.analyzers[suite].analyze_many(targets, mode, no_all)
+        return results
+    
+    def compare(self, targets: List[str], mode: str = "binary", no_all: str = "yes",
+                affected_in: List[str] = (), not_affected_in: List[str] = ()) -> List[SuiteImpact]:
+        """跨suite比较受影响的源码包
+        
+        Args:
+            targets: 目标包名列表
+            mode: "binary" 或 "source"
+            no_all: 是否过滤all架构包
+            affected_in: 只保留在这些suite中都受影响的源码包
+            not_affected_in: 只保留在这些suite中都不受影响（不存在或存在但不受影响）的源码包
+            
+        Returns:
+            List[SuiteImpact]: 按各suite中的发现顺序排列
+        """
+        required = self._mask(affected_in)
+        excluded = self._mask(not_affected_in)
+        results = self.analyze(targets, mode, no_all)
+        
+        affected = {}
+        first_result = {}
+        for i, result in enumerate(results.values()):
+            bit = 1 << i
+            for source_pkg, data in result.items():
+                affected[source_pkg] = affected.get(source_pkg, 0) | bit
+                first_result.setdefault(source_pkg, data)
+        
+        everywhere = (1 << len(self.analyzers)) - 1
+        impacts = []
+        for source_pkg, mask in affected.items():
+            if mask & required != required or mask & excluded:
+                continue
+            present = self.source_suites.get(source_pkg, 0)
+            impacts.append(SuiteImpact(source_pkg, self._names(mask), self._names(present & ~mask),
+                                       self._names(everywhere & ~present), first_result[source_pkg]))
+        return impacts
+    
+    def run(self, targets: List[str], mode: str = "binary", no_all: str = "yes", output_formats: List[str] = ("excel",),
+            print_results: bool = True, affected_in: List[str] = (), not_affected_in: List[str] = ()) -> List[str]:
+        """跨suite比较并打印、导出结果，返回生成的结果文件路径"""
+        mode_name = "二进制包" if mode == "binary" else "源码包"
+        print(f"\n跨suite分析目标{mode_name}: {', '.join(targets)}（{', '.join(self.analyzers)}）")
+        print("=" * 50)
+        impacts = self.compare(targets, mode, no_all, affected_in, not_affected_in)
+        
+        conditions = [f"在 {', '.join(affected_in)} 中受影响"] if affected_in else []
+        if not_affected_in:
+            conditions.append(f"在 {', '.join(not_affected_in)} 中不受影响")
+        
+        if print_results:
+            print(f"\n跨suite比较结果{'（' + '，'.join(conditions) + '）' if conditions else ''}:")
+            print("=" * 80)
+            for impact in impacts:
+                print(f"源码包: {impact.package}")
+                print(f"  受影响: {', '.join(impact.affected_in)}")
+                if impact.unaffected_in:
+                    print(f"  不受影响: {', '.join(impact.unaffected_in)}")
+                if impact.missing_in:
+                    print(f"  不存在: {', '.join(impact.missing_in)}")
+                print(f"  依赖链条（{impact.affected_in[0]}）: {'; '.join(render_chains(impact.result['chains']))}")
+                print("-" * 40)
+        
+        columns = ['package', 'affected_in', 'unaffected_in', 'missing_in', 'category', 'arch', 'homepage',
+                   'dependency_chain']
+        rows = [{
+            'package': impact.package,
+            'affected_in': ' '.join(impact.affected_in),
+            'unaffected_in': ' '.join(impact.unaffected_in),
+            'missing_in': ' '.join(impact.missing_in),
+            'category': impact.result['category'],
+            'arch': impact.result['arch'],
+            'homepage': impact.result['homepage'],
+            'dependency_chain': '; '.join(render_chains(impact.result['chains'])),
+        } for impact in impacts]
+        
+        filepaths = []
+        if rows:
+            for output_format in output_formats:
+                filepath = self.analyzer._export_table(rows, columns, targets, output_format,
+                                                       "suite_comparison", "suite比较")
+                filepaths.append(filepath)
+                print(f"结果文件已保存到: {filepath}")
+        
+        counts = {suite: sum(1 for impact in impacts if suite in impact.affected_in) for suite in self.analyzers}
+        print(f"\n分析完成！")
+        print(f"共 {len(impacts)} 个源码包（{', '.join(f'{suite}: {count} 个受影响' for suite, count in counts.items())}）")
+        return filepaths
+
+
+class QueryServer:
+    """常驻查询服务：保持已加载的包表、反向索引和依赖图，通过本地HTTP JSON接口回答查询
+    
+    每个请求由ThreadingHTTPServer的独立线程处理；查询只读取预先构建好的索引，可以并发执行。
+    最近的查询结果保存在LRU缓存中。reload()用新的分析器对象加载更新后的Sources，
+    准备完毕后一次性替换当前分析器并清空缓存，正在处理的请求继续使用旧对象。
+    
+    接口（GET，参数为查询字符串，多个包名用逗号分隔）：
+        /binary?targets=...&no_all=yes      二进制包模式
+        /source?targets=...&no_all=yes      源码包模式
+        /build-order?targets=...&no_all=yes 分轮构建顺序
+        /rank?packages=...&top=20&no_all=yes 影响排名
+        /info?package=...                   源码包信息及其二进制包
+        /status                             服务状态
+    POST /reload 立即检查并加载更新的Sources。
+    """
+    
+    def __init__(self, analyzer: PackageDependencyAnalyzer, offline: bool = False, cache_size: int = 256):
+        self._analyzer = analyzer
+        self.offline = offline
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._generation = 0
+        self._loaded_at = None
+        self._sources_state = None
+        self._hits = 0
+        self._misses = 0
+    
+    @staticmethod
+    def _file_state(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    def _warm(self, analyzer: PackageDependencyAnalyzer):
+        """在对外提供服务前构建所有索引，之后的查询不再修改分析器
+        
+        两种no_all设置的影响排名都预先计算，/rank请求只读取内存中的排名，
+        不会在请求线程中计算排名或写入Sources.ranking。
+        """
+        analyzer.workers = 1  # 不在请求线程中fork进程池
+        analyzer._get_packages()
+        analyzer._get_reverse_index()
+        analyzer._get_source_graph()
+        for no_all in ('yes', 'no'):
+            analyzer.impact_ranking(no_all)
+    
+    def load(self):
+        """首次加载当前分析器的索引"""
+        self._warm(self._analyzer)
+        self._sources_state = self._file_state(self._analyzer.sources_file)
+        self._loaded_at = datetime.now().isoformat(timespec='seconds')
+    
+    def reload(self, force: bool = False) -> bool:
+        """检查Sources是否更新，有更新时加载到新的分析器并原子地替换当前分析器，返回是否替换"""
+        with self._reload_lock:
+            analyzer = self._analyzer._clone_config()
+            
+            if self.offline:
+                # 离线模式：Sources文件被外部替换时才重新加载
+                state = self._file_state(analyzer.sources_file)
+                if state == self._sources_state and not force:
+                    return False
+            else:
+                if not analyzer.init(force) and not force:
+                    return False
+                state = self._file_state(analyzer.sources_file)
+            
+            self._warm(analyzer)
+            with self._lock:
+                self._analyzer = analyzer
+                self._generation += 1
+                self._cache.clear()
+                self._sources_state = state
+                self._loaded_at = datetime.now().isoformat(timespec='seconds')
+            # 新分析器的索引已经建好，查询不再解析依赖字段；清空解析缓存，不保留历次Sources的字段
+            clear_relation_caches()
+            return True
+    
+    def status(self) -> Dict[str, any]:
+        with self._lock:
+            analyzer = self._analyzer
+            return {
+                'generation': self._generation,
+                'loaded_at': self._loaded_at,
+                'sources_file': analyzer.sources_file,
+                'source_packages': len(analyzer._packages),
+                'cache_entries': len(self._cache),
+                'cache_hits': self._hits,
+                'cache_misses': self._misses,
+                'stats': analyzer.stats.summary(),
             }
+    
+    def query(self, kind: str, params: Dict[str, str]) -> bytes:
+        """执行一次查询，返回UTF-8编码的JSON响应体
+        
+        大目标的结果可达数MB，编码本身就很耗时，因此缓存的是编码后的响应体，相同的查询直接返回。
+        """
+        no_all = params.get('no_all', 'yes')
+        if no_all not in ('yes', 'no'):
+            raise ValueError("no_all 只能为 yes 或 no")
+        
+        while True:
+            with self._lock:
+                analyzer = self._analyzer
+                key = (self._generation, kind, tuple(sorted(params.items())))
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    self._hits += 1
+                    return self._cache[key]
+                # 同样的查询正在由其他线程执行时等待其结果，避免并发请求重复计算大结果
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = threading.Event()
+                    self._misses += 1
+                    break
+            pending.wait()
+        
+        try:
+            body = json.dumps(self._execute(analyzer, kind, params, no_all), ensure_ascii=False).encode('utf-8')
+            with self._lock:
+                # 查询期间可能已经替换了分析器，旧结果不再缓存
+                if key[0] == self._generation:
+                    self._cache[key] = body
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+        return body
+    
+    @staticmethod
+    def _split_names(value: str) -> List[str]:
+        return list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    
+    def _execute(self, analyzer: PackageDependencyAnalyzer, kind: str, params: Dict[str, str],
+                 no_all: str) -> Dict[str, any]:
+        if kind == 'info':
+            package = params.get('package', '').strip()
+            if not package:
+                raise ValueError("缺少参数 package")
+            return {'package': package, **analyzer.package_info(package),
+                    'binaries': analyzer.get_binary_packages(package)}
+        
+        if kind == 'rank':
+            ranking = analyzer.impact_ranking(no_all)
+            if params.get('packages'):
+                wanted = set(self._split_names(params['packages']))
+                ranking = [row for row in ranking if row.package in wanted]
+            else:
+                ranking = ranking[:int(params.get('top', 20))]
+            return {'ranking': [row._asdict() for row in ranking]}
         
-        # 导出到Excel
-        if comprehensive_result:
-            print(f"\n正在导出结果到Excel...")
-            excel_filepath = self.export_to_excel(comprehensive_result, target_list)
-            print(f"Excel文件已保存到: {excel_filepath}")
+        targets = self._split_names(params.get('targets', ''))
+        if not targets:
+            raise ValueError("缺少参数 targets")
         
-        return comprehensive_result
+        if kind == 'build-order':
+            order = analyzer.build_order(targets, no_all)
+            return {'targets': targets, 'waves': order.waves, 'cycles': order.cycles}
+        
+        results = {}
+        for source_pkg, data in analyzer.iter_results(targets, kind, no_all):
+            results[source_pkg] = {key: data[key] for key in ('category', 'arch', 'homepage')}
+            results[source_pkg]['chains'] = render_chains(data['chains'])
+        return {'targets': targets, 'mode': kind, 'count': len(results), 'results': results}
+    
+    def serve(self, host: str = "127.0.0.1", port: int = 8080, reload_interval: int = 0):
+        """启动HTTP服务直到被中断；reload_interval秒（大于0时）定期检查Sources更新"""
+        # 分析器的INFO日志在并发请求中没有意义，服务期间只保留警告；
+        # 服务自身的日志来自子记录器，不经过父记录器的过滤器
+        quiet = lambda record: record.levelno >= logging.WARNING
+        logger.addFilter(quiet)
+        try:
+            self.load()
+            httpd = _QueryHTTPServer((host, port), _QueryHandler)
+            httpd.query_server = self
+            
+            stop = threading.Event()
+            if reload_interval > 0:
+                threading.Thread(target=self._reload_loop, args=(reload_interval, stop), daemon=True).start()
+            
+            server_logger.info("查询服务已启动 http://%s:%d/ （%d 个源码包）",
+                               host, httpd.server_port, len(self._analyzer._packages))
+            try:
+                httpd.serve_forever()
+            finally:
+                stop.set()
+                httpd.server_close()
+        finally:
+            logger.removeFilter(quiet)
+    
+    def _reload_loop(self, interval: int, stop: threading.Event):
+        while not stop.wait(interval):
+            try:
+                if self.reload():
+                    server_logger.info("已加载更新的Sources（第 %d 版）", self._generation)
+            except Exception as e:
+                server_logger.warning("重新加载Sources失败: %s", e)
 
 
-def main():
-    """程序入口点"""
-    analyzer = PackageDependencyAnalyzer()
+class _QueryHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的监听队列只有5，并发连接稍多就会丢弃SYN，客户端要等待约1秒重传
+    request_queue_size = 128
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """QueryServer的HTTP接口"""
+    
+    QUERY_KINDS = {'/binary': 'binary', '/source': 'source', '/build-order': 'build-order',
+                   '/rank': 'rank', '/info': 'info'}
+    
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        server = self.server.query_server
+        if url.path == '/status':
+            return self._send(200, server.status())
+        kind = self.QUERY_KINDS.get(url.path)
+        if kind is None:
+            return self._send(404, {'error': f"未知的接口: {url.path}"})
+        
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            body = server.query(kind, params)
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+        self._send_body(200, body)
+    
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/reload':
+            return self._send(404, {'error': f"未知的接口: {url.path}"})
+        force = urllib.parse.parse_qs(url.query).get('force', ['no'])[-1] == 'yes'
+        try:
+            reloaded = self.server.query_server.reload(force)
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+        self._send(200, {'reloaded': reloaded, **self.server.query_server.status()})
+    
+    def _send(self, code: int, payload: Dict[str, any]):
+        self._send_body(code, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+    
+    def _send_body(self, code: int, body: bytes):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        # 负载测试时逐条请求日志会成为瓶颈，只记录错误
+        pass
+    
+    def log_error(self, format, *args):
+        server_logger.error("%s - %s", self.address_string(), format % args)
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    """命令行参数定义"""
+    parser = argparse.ArgumentParser(
+        description="Debian 源码包构建依赖分析工具。未指定目标时进入交互模式。"
+    )
+    parser.add_argument("targets", nargs="*", help="目标包名，可用空格或逗号分隔")
+    parser.add_argument("-m", "--mode", choices=["binary", "source", "build-order", "rank", "diff"], default="binary",
+                        help="分析模式：binary 以二进制包为目标，source 以源码包为目标，"
+                             "build-order 以源码包为目标输出分轮重建顺序，"
+                             "rank 输出整个归档的影响排名（可不指定目标），"
+                             "diff 比较旧Sources文件（--old-sources）与当前Sources（默认binary）")
+    parser.add_argument("-f", "--targets-file", help="从文件读取目标包名，每行一个（# 开头为注释）；- 表示标准输入")
+    parser.add_argument("--no-all", choices=["yes", "no"], default="yes", help="是否过滤纯all架构的包（默认yes）")
+    parser.add_argument("--offline", action="store_true", help="不更新Sources，直接使用result目录中已有的文件")
+    parser.add_argument("--sources", metavar="PATH", help="使用指定的Sources文件（隐含--offline）")
+    parser.add_argument("--force-download", action="store_true", help="忽略缓存，强制重新下载Sources.xz")
+    parser.add_argument("--suite", default="trixie", help="分析的Debian发行版（默认trixie）")
+    parser.add_argument("--components", default="main",
+                        help="逗号分隔的组件，例如 main,contrib,non-free，合并成一个Sources分析（默认main）")
+    parser.add_argument("--suites", metavar="LIST",
+                        help="逗号分隔的多个suite，例如 trixie,sid；写成 名称=路径 时使用本地Sources文件。"
+                             "并行下载解析后在各suite中分别分析并比较（只支持binary和source模式）")
+    parser.add_argument("--affected-in", default="", metavar="LIST",
+                        help="与--suites一起使用：只输出在这些suite中都受影响的源码包")
+    parser.add_argument("--not-affected-in", default="", metavar="LIST",
+                        help="与--suites一起使用：只输出在这些suite中都不受影响（或不存在）的源码包")
+    parser.add_argument("--format", type=_parse_formats, default=["excel"],
+                        help="结果导出格式，逗号分隔，可选 excel/csv/jsonl/parquet/none（默认excel）")
+    parser.add_argument("--print-results", action=argparse.BooleanOptionalAction, default=True,
+                        help="是否在控制台逐个打印受影响源码包（默认打印）")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="并行遍历的工作进程数（默认1；不一定比单进程快，见README）")
+    parser.add_argument("--max-depth", type=int, default=None, help="最大遍历深度（默认不限制）")
+    parser.add_argument("--max-chains", type=int, default=1,
+                        help="每个受影响源码包对每个目标记录的最短依赖链条数（默认1）")
+    parser.add_argument("--max-package-chains", type=int, default=None,
+                        help="每个受影响源码包最多输出的最短依赖链条数（所有目标合计，默认不限制）")
+    parser.add_argument("--serve", action="store_true", help="以常驻查询服务方式运行，通过HTTP JSON接口回答查询")
+    parser.add_argument("--host", default="127.0.0.1", help="查询服务监听地址（默认127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8080, help="查询服务端口（默认8080）")
+    parser.add_argument("--reload-interval", type=int, default=0,
+                        help="查询服务每隔多少秒检查一次Sources更新（默认0，不自动检查）")
+    parser.add_argument("--cache-size", type=int, default=256, help="查询服务缓存的最近查询结果数（默认256）")
+    parser.add_argument("--old-sources", metavar="PATH",
+                        help="diff模式比较的旧Sources文件（默认为--keep-previous保留的Sources.prev）")
+    parser.add_argument("--keep-previous", action="store_true",
+                        help="下载新的Sources时把旧文件保留为Sources.prev，供diff模式比较")
+    parser.add_argument("--top", type=int, default=20, help="rank模式在控制台打印的行数（默认20）")
+    parser.add_argument("--packages-arch", metavar="ARCHS", default="",
+                        help="逗号分隔的架构，额外加载这些架构的Packages.xz以解析Provides（虚包），例如 amd64,arm64")
+    parser.add_argument("--arch", help="只考虑在该架构上生效的依赖，例如 amd64（默认不按架构过滤）")
+    parser.add_argument("--profiles", help="逗号分隔的启用构建配置，例如 nocheck,nodoc；空字符串表示不启用任何配置（默认不按配置过滤）")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="日志级别，日志输出到stderr；DEBUG时输出每个目标的分析过程（默认INFO）")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="运行结束时把各阶段耗时、计数器和峰值内存以JSON写入该文件；- 表示stderr")
+    parser.add_argument("--profile", metavar="PREFIX", nargs="?", const="profile",
+                        help="在cProfile和tracemalloc下运行，结束时写出 PREFIX.prof 和 PREFIX.txt（默认前缀profile）；"
+                             "会明显拖慢运行")
+    return parser
+
+
+def _parse_formats(value: str) -> List[str]:
+    """解析 --format 参数"""
+    formats = [item.strip() for item in value.split(',') if item.strip()]
+    if formats == ["none"]:
+        return []
+    unknown = [item for item in formats if item not in RESULT_WRITERS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的输出格式: {', '.join(unknown)}")
+    return list(dict.fromkeys(formats))
+
+
+def _read_targets(args: argparse.Namespace) -> List[str]:
+    """合并命令行和目标文件中的目标包名，保持顺序并去重"""
+    names = []
+    for item in args.targets:
+        names.extend(item.split(','))
+    
+    if args.targets_file:
+        if args.targets_file == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(args.targets_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        for line in lines:
+            line = line.split('#', 1)[0]
+            names.extend(line.replace(',', ' ').split())
+    
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def _split_list(value: str) -> List[str]:
+    """解析逗号分隔的参数"""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _load_suites(analyzer: PackageDependencyAnalyzer, args: argparse.Namespace, targets: List[str]) -> SuiteSet:
+    """按 --suites 创建SuiteSet，并行下载（非离线时）并加载所有suite"""
+    if args.serve or args.mode not in ("binary", "source"):
+        raise ValueError("--suites 只支持binary和source模式")
+    if not targets:
+        raise ValueError("未提供有效的目标包名")
+    
+    suites = []
+    sources_files = {}
+    for item in _split_list(args.suites):
+        name, sep, path = item.partition("=")
+        suites.append(name.strip())
+        if sep:
+            sources_files[name.strip()] = path.strip()
+    unknown = [suite for suite in _split_list(args.affected_in) + _split_list(args.not_affected_in)
+               if suite not in suites]
+    if unknown:
+        raise ValueError(f"--affected-in/--not-affected-in 中的suite不在 --suites 中: {', '.join(unknown)}")
+    
+    suite_set = SuiteSet(analyzer, suites, sources_files)
+    suite_set.load(offline=bool(args.offline or args.sources), force=args.force_download)
+    return suite_set
+
+
+@contextlib.contextmanager
+def _profiled(prefix: str):
+    """在cProfile和tracemalloc下运行，结束时写出 PREFIX.prof（可用pstats、snakeviz等查看）
+    和 PREFIX.txt（内存分配最多的代码行及累计耗时最多的函数）"""
+    import cProfile
+    import pstats
+    
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
     try:
-        analyzer.main()
-    except KeyboardInterrupt:
-        print("\n\nINFO: 用户中断操作")
-    except Exception as e:
-        print(f"ERROR: {e}")
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        profiler.dump_stats(prefix + ".prof")
+        with open(prefix + ".txt", 'w', encoding='utf-8') as f:
+            f.write(f"tracemalloc: 当前 {current / 1024 / 1024:.1f} MB，峰值 {peak / 1024 / 1024:.1f} MB\n\n")
+            f.write("分配内存最多的代码行:\n")
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f"  {stat}\n")
+            f.write("\n")
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+        logger.info("性能剖析结果已保存到: %s.prof, %s.txt", prefix, prefix)
+
+
+def _write_stats(analyzer: PackageDependencyAnalyzer, args: argparse.Namespace, exit_code: int):
+    """把本次运行的统计写成JSON（--stats）"""
+    summary = {
+        'mode': "serve" if args.serve else args.mode,
+        'sources_file': analyzer.sources_file,
+        'exit_code': exit_code,
+        **analyzer.stats.summary(),
+    }
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.stats == "-":
+        print(text, file=sys.stderr)
+    else:
+        with open(args.stats, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        logger.info("运行统计已保存到: %s", args.stats)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """程序入口点，返回进程退出码"""
+    args = _build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(levelname)s: %(message)s")
+    
+    analyzer = PackageDependencyAnalyzer()
+    analyzer.workers = args.workers
+    analyzer.max_depth = args.max_depth
+    analyzer.max_chains = args.max_chains
+    analyzer.max_package_chains = args.max_package_chains
+    analyzer.rank_top = args.top
+    analyzer.keep_previous_sources = args.keep_previous
+    analyzer.suite = args.suite
+    analyzer.components = [component.strip() for component in args.components.split(",") if component.strip()]
+    analyzer.packages_archs = [arch.strip() for arch in args.packages_arch.split(",") if arch.strip()]
+    if args.arch is not None or args.profiles is not None:
+        profiles = None if args.profiles is None else [p.strip() for p in args.profiles.split(",") if p.strip()]
+        analyzer.set_dependency_filter(args.arch, profiles)
+    if args.sources:
+        analyzer.sources_file = args.sources
+    
+    exit_code = 0
+    # 剖析在分析器仍持有所有数据时结束，内存分配统计反映运行中的真实占用
+    with _profiled(args.profile) if args.profile else contextlib.nullcontext():
+        try:
+            targets = _read_targets(args)
+            
+            suite_set = None
+            if args.suites:
+                suite_set = _load_suites(analyzer, args, targets)
+            elif args.offline or args.sources:
+                if not os.path.exists(analyzer.sources_file):
+                    raise FileNotFoundError(f"Sources文件不存在: {analyzer.sources_file}")
+            else:
+                analyzer.init(force=args.force_download)
+            
+            if suite_set is not None:
+                suite_set.run(targets, args.mode, args.no_all, args.format, args.print_results,
+                              _split_list(args.affected_in), _split_list(args.not_affected_in))
+            elif args.serve:
+                QueryServer(analyzer, offline=bool(args.offline or args.sources),
+                            cache_size=args.cache_size).serve(args.host, args.port, args.reload_interval)
+            elif args.mode == "diff":
+                old_sources_file = args.old_sources or analyzer._previous_sources_path()
+                if not os.path.exists(old_sources_file):
+                    raise FileNotFoundError(f"旧Sources文件不存在: {old_sources_file}")
+                analyzer.run("diff", [old_sources_file], args.no_all, args.format, args.print_results)
+            elif targets or args.mode == "rank":
+                analyzer.run(args.mode, targets, args.no_all, args.format, args.print_results)
+            elif args.targets or args.targets_file or not sys.stdin.isatty():
+                # 批处理环境中不能阻塞等待输入
+                raise ValueError("未提供有效的目标包名")
+            else:
+                analyzer.interactive()
+        except KeyboardInterrupt:
+            print(file=sys.stderr)
+            logger.info("用户中断操作")
+            exit_code = 130
+        except Exception as e:
+            logger.error("%s", e)
+            exit_code = 1
+        
+        # 中断或出错时也输出统计，便于查看长时间运行的时间花在哪里
+        if args.stats:
+            _write_stats(analyzer, args, exit_code)
+    
+    return exit_code
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())